@@ -0,0 +1,142 @@
+import os
+import re
+import fcntl
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from armazenamento import nomes_com_prefixo
+
+# Escolha dos nomes de saída dos planos ("base.dxf", "base_02.dxf", ...) sem listar a pasta inteira.
+# Cada nome base tem um conjunto de sufixos ocupados, semeado uma vez pelos arquivos da pasta de saída com
+# aquele prefixo. As reservas são atômicas entre threads (lock) e entre processos/workers da API
+# (arquivo de reservas por nome base, protegido com flock).
+ALOCADOR_DIR = os.getenv("ALOCADOR_DIR", "/tmp/alocador_nomes")
+ALOCADOR_BASES_MAX = int(os.getenv("ALOCADOR_BASES_MAX", "1024"))
+ALOCADOR_TTL_HORAS = float(os.getenv("ALOCADOR_TTL_HORAS", "48"))  # idade máxima dos arquivos de reservas
+
+_bases = OrderedDict()  # nome_base -> _EstadoBase
+_lock = threading.Lock()
+
+
+class _EstadoBase:
+    __slots__ = ("ocupados", "proximo", "offset", "arquivo")
+
+    def __init__(self):
+        self.ocupados = set()  # sufixos já usados (1 = o próprio nome base)
+        self.proximo = 1       # menor sufixo que pode estar livre
+        self.offset = 0        # quanto do arquivo de reservas já foi lido
+        self.arquivo = None    # (dispositivo, inode) do arquivo de reservas lido
+
+
+def _partes(nome_base):
+    if nome_base.endswith('.dxf'):
+        return nome_base[:-4], '.dxf'
+    return nome_base, ''
+
+
+def nome_com_sufixo(nome_base, indice):
+    """indice 1 é o próprio nome base; os demais ganham _NN antes da extensão."""
+    if indice == 1:
+        return nome_base
+    raiz, extensao = _partes(nome_base)
+    return f"{raiz}_{indice:02d}{extensao}"
+
+
+def _sufixo(nome_base, nome):
+    """Sufixo do nome dentro da sequência do nome base, ou None se o nome não pertence a ela."""
+    if nome == nome_base:
+        return 1
+    raiz, extensao = _partes(nome_base)
+    m = re.fullmatch(rf"{re.escape(raiz)}_(\d{{2,}}){re.escape(extensao)}", nome)
+    return int(m.group(1)) if m else None
+
+
+def _caminho_reservas(nome_base):
+    return os.path.join(ALOCADOR_DIR, hashlib.md5(nome_base.encode('utf-8')).hexdigest() + ".txt")
+
+
+def _remover_reservas_antigas():
+    limite = time.time() - ALOCADOR_TTL_HORAS * 3600
+    try:
+        entradas = list(os.scandir(ALOCADOR_DIR))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+
+def _estado(nome_base):
+    """
+    Estado do nome base. Na primeira vez a pasta de saída é consultada fora do lock (uma consulta lenta
+    não segura as reservas de outros nomes); se outra thread instalou o estado nesse meio tempo, vale o dela.
+    """
+    with _lock:
+        estado = _bases.get(nome_base)
+        if estado is not None:
+            _bases.move_to_end(nome_base)
+            return estado
+
+    novo = _EstadoBase()
+    raiz, _ = _partes(nome_base)
+    for nome in nomes_com_prefixo(raiz):
+        sufixo = _sufixo(nome_base, nome)
+        if sufixo is not None:
+            novo.ocupados.add(sufixo)
+    _remover_reservas_antigas()
+
+    with _lock:
+        estado = _bases.setdefault(nome_base, novo)
+        _bases.move_to_end(nome_base)
+        while len(_bases) > ALOCADOR_BASES_MAX:
+            _bases.popitem(last=False)
+    return estado
+
+
+def reservar_nomes(nome_base, quantidade):
+    """
+    Reserva `quantidade` nomes livres na sequência do nome base, na ordem dos sufixos, e os devolve.
+    Um nome devolvido não volta a ser entregue por nenhuma thread ou processo que use o mesmo ALOCADOR_DIR.
+    """
+    os.makedirs(ALOCADOR_DIR, exist_ok=True)
+    estado = _estado(nome_base)
+    with _lock:
+        with open(_caminho_reservas(nome_base), 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # Arquivo recriado (limpeza por TTL) ou truncado: as reservas são relidas desde o início
+                st = os.fstat(f.fileno())
+                if (st.st_dev, st.st_ino) != estado.arquivo or st.st_size < estado.offset:
+                    estado.offset = 0
+                    estado.arquivo = (st.st_dev, st.st_ino)
+                # Reservas feitas por outros processos desde a última leitura
+                f.seek(estado.offset)
+                for linha in f.read().splitlines():
+                    sufixo = _sufixo(nome_base, linha)
+                    if sufixo is not None:
+                        estado.ocupados.add(sufixo)
+
+                nomes = []
+                while len(nomes) < quantidade:
+                    while estado.proximo in estado.ocupados:
+                        estado.proximo += 1
+                    estado.ocupados.add(estado.proximo)
+                    nomes.append(nome_com_sufixo(nome_base, estado.proximo))
+
+                f.seek(0, os.SEEK_END)
+                f.write("".join(f"{nome}\n" for nome in nomes))
+                f.flush()
+                estado.offset = f.tell()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    return nomes
+
+
+def limpar_alocador():
+    with _lock:
+        _bases.clear()
@@ -0,0 +1,480 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import datetime
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cache_drive
+from metricas import cronometrado
+
+# Onde ficam as peças, as placas e os planos gerados. O resto da API só usa as funções deste módulo;
+# a implementação é escolhida por ARMAZENAMENTO: "drive" (padrão), "local" (pastas em ARMAZENAMENTO_DIR)
+# ou "memoria" (tudo em memória, semeado opcionalmente a partir de ARMAZENAMENTO_DIR).
+ARMAZENAMENTO = os.getenv("ARMAZENAMENTO", "drive")
+ARMAZENAMENTO_DIR = os.getenv("ARMAZENAMENTO_DIR", "")
+# Downloads/uploads simultâneos (o nome antigo DRIVE_UPLOAD_WORKERS continua valendo)
+ARMAZENAMENTO_WORKERS = int(os.getenv("ARMAZENAMENTO_WORKERS", os.getenv("DRIVE_UPLOAD_WORKERS", "8")))
+
+# Pastas lógicas
+PASTA_SAIDA = "saida"
+PASTA_PADRONIZADOS = "arquivos padronizados"
+PASTA_PLACAS = "placas"
+PASTA_ARQUIVO_MORTO = "arquivo morto"
+
+# Metadados de um arquivo em qualquer implementação: {'id', 'name', 'md5Checksum', 'modifiedTime'}
+
+
+class Armazenamento:
+    """
+    Interface do armazenamento: listar, stat, buscar (para um caminho local), enviar, mover e publicar.
+    As implementações só precisam dos métodos que levantam NotImplementedError; os demais têm
+    versões genéricas em cima de listar().
+    """
+
+    def listar(self, pasta):
+        """Metadados de todos os arquivos da pasta (nomes repetidos inclusos)."""
+        raise NotImplementedError
+
+    def indice(self, pasta, forcar=False):
+        """{nome: metadados}; nomes repetidos mantêm o primeiro. forcar=True ignora qualquer cache."""
+        indice = {}
+        for meta in self.listar(pasta):
+            indice.setdefault(meta['name'], meta)
+        return indice
+
+    def stat(self, pasta, nome):
+        """Metadados do arquivo ou None. Um nome ausente força uma única releitura (pode ser novo)."""
+        meta = self.indice(pasta).get(nome)
+        if meta is None:
+            meta = self.indice(pasta, forcar=True).get(nome)
+        return meta
+
+    def listar_com_prefixos(self, pasta, prefixos):
+        """Arquivos cujo nome começa (sem diferenciar maiúsculas) com algum dos prefixos."""
+        minusculos = tuple(prefixo.lower() for prefixo in prefixos)
+        return [meta for meta in self.listar(pasta) if meta['name'].lower().startswith(minusculos)]
+
+    def buscar(self, meta):
+        """Caminho local com o conteúdo do arquivo."""
+        raise NotImplementedError
+
+    def enviar(self, caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+        """Grava o arquivo local na pasta (com um ID reservado, se houver) e retorna o ID."""
+        raise NotImplementedError
+
+    def mover(self, file_ids, destino, origem):
+        """Move os arquivos entre pastas. Retorna [(file_id, exceção)] das falhas."""
+        raise NotImplementedError
+
+    def publicar(self, file_ids):
+        """Torna os arquivos acessíveis pelo link e retorna as URLs, na mesma ordem."""
+        return [self.url_publica(file_id) for file_id in file_ids]
+
+    def reservar_ids(self, quantidade):
+        return [uuid.uuid4().hex for _ in range(quantidade)]
+
+    def url_publica(self, file_id):
+        raise NotImplementedError
+
+
+class ArmazenamentoDrive(Armazenamento):
+    """Google Drive (google_drive.py), com índice de pastas, espelho e cache em disco."""
+
+    def __init__(self):
+        import google_drive
+        self.drive = google_drive
+
+    def _pasta_id(self, pasta):
+        if pasta == PASTA_SAIDA:
+            return self.drive.FOLDER_ID
+        if pasta == PASTA_PLACAS:
+            return self.drive.FOLDER_ID_PLACAS
+        return self.drive.obter_id_subpasta(pasta, criar=(pasta == PASTA_ARQUIVO_MORTO))
+
+    def listar(self, pasta):
+        return self.drive.listar_pasta(self._pasta_id(pasta))
+
+    def indice(self, pasta, forcar=False):
+        return self.drive.indice_pasta(self._pasta_id(pasta), forcar=forcar)
+
+    def listar_com_prefixos(self, pasta, prefixos):
+        return self.drive.listar_com_prefixos(self._pasta_id(pasta), prefixos)
+
+    def buscar(self, meta):
+        return self.drive.baixar_arquivo_por_id(meta['id'], meta['name'], md5=meta.get('md5Checksum'), http=self.drive._http_da_thread())
+
+    def enviar(self, caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+        return self.drive.criar_arquivo(caminho, nome, self._pasta_id(pasta), file_id)
+
+    def mover(self, file_ids, destino, origem):
+        return self.drive.mover_em_lote(file_ids, self._pasta_id(destino), self._pasta_id(origem))
+
+    def publicar(self, file_ids):
+        return self.drive.publicar_arquivos(file_ids)
+
+    def reservar_ids(self, quantidade):
+        return self.drive.reservar_ids(quantidade)
+
+    def url_publica(self, file_id):
+        return self.drive.url_publica(file_id)
+
+
+def _modificado_em(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class ArmazenamentoLocal(Armazenamento):
+    """
+    Pastas em disco: <raiz>/<pasta>/<nome>. O ID de um arquivo é o caminho relativo à raiz; arquivos criados
+    com ID reservado ganham um link em <raiz>/.ids/<id>. Sem cópia no buscar: o caminho devolvido é o próprio arquivo.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = os.path.abspath(raiz)
+        self._ids = os.path.join(self.raiz, ".ids")
+
+    def _caminho(self, file_id):
+        link = os.path.join(self._ids, file_id)
+        if os.path.lexists(link):
+            return os.path.realpath(link)
+        return os.path.join(self.raiz, file_id)
+
+    def _meta(self, pasta, entrada):
+        st = entrada.stat()
+        return {
+            'id': f"{pasta}/{entrada.name}",
+            'name': entrada.name,
+            'md5Checksum': f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            'modifiedTime': _modificado_em(st.st_mtime),
+        }
+
+    def listar(self, pasta):
+        try:
+            entradas = sorted(os.scandir(os.path.join(self.raiz, pasta)), key=lambda e: e.name)
+        except FileNotFoundError:
+            return []
+        return [self._meta(pasta, e) for e in entradas if e.is_file() and not e.name.endswith(".part")]
+
+    def buscar(self, meta):
+        caminho = self._caminho(meta['id'])
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"{meta['name']} não encontrado em {self.raiz}.")
+        return caminho
+
+    def enviar(self, caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+        destino_dir = os.path.join(self.raiz, pasta)
+        os.makedirs(destino_dir, exist_ok=True)
+        fd, caminho_tmp = tempfile.mkstemp(dir=destino_dir, suffix=".part")
+        with os.fdopen(fd, 'wb') as f, open(caminho, 'rb') as origem:
+            shutil.copyfileobj(origem, f)
+        os.replace(caminho_tmp, os.path.join(destino_dir, nome))
+        if not file_id:
+            return f"{pasta}/{nome}"
+        os.makedirs(self._ids, exist_ok=True)
+        link = os.path.join(self._ids, file_id)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.join("..", pasta, nome), link)
+        return file_id
+
+    def mover(self, file_ids, destino, origem):
+        os.makedirs(os.path.join(self.raiz, destino), exist_ok=True)
+        erros = []
+        for file_id in file_ids:
+            caminho = self._caminho(file_id)
+            try:
+                if os.path.dirname(caminho) != os.path.join(self.raiz, origem):
+                    raise FileNotFoundError(f"{file_id} não está em {origem}.")
+                os.replace(caminho, os.path.join(self.raiz, destino, os.path.basename(caminho)))
+            except OSError as e:
+                erros.append((file_id, e))
+        return erros
+
+    def url_publica(self, file_id):
+        return "file://" + os.path.join(self._ids if os.path.lexists(os.path.join(self._ids, file_id)) else self.raiz, file_id)
+
+
+class ArmazenamentoMemoria(Armazenamento):
+    """Tudo em memória (pasta -> {id: metadados + conteúdo}); buscar grava no cache em disco, como o Drive."""
+
+    def __init__(self):
+        self.pastas = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, pasta, nome, conteudo, file_id=None):
+        file_id = file_id or uuid.uuid4().hex
+        meta = {
+            'id': file_id,
+            'name': nome,
+            'md5Checksum': hashlib.md5(conteudo).hexdigest(),
+            'modifiedTime': _modificado_em(datetime.datetime.now().timestamp()),
+        }
+        with self._lock:
+            self.pastas.setdefault(pasta, {})[file_id] = (meta, conteudo)
+        return file_id
+
+    def semear(self, raiz):
+        """Carrega as subpastas de raiz (uma por pasta lógica) para a memória."""
+        for pasta in (PASTA_SAIDA, PASTA_PADRONIZADOS, PASTA_PLACAS, PASTA_ARQUIVO_MORTO):
+            caminho = os.path.join(raiz, pasta)
+            if not os.path.isdir(caminho):
+                continue
+            for nome in sorted(os.listdir(caminho)):
+                arquivo = os.path.join(caminho, nome)
+                if os.path.isfile(arquivo):
+                    with open(arquivo, 'rb') as f:
+                        self.adicionar(pasta, nome, f.read())
+
+    def listar(self, pasta):
+        with self._lock:
+            return [dict(meta) for meta, _ in self.pastas.get(pasta, {}).values()]
+
+    def _conteudo(self, file_id):
+        with self._lock:
+            for arquivos in self.pastas.values():
+                if file_id in arquivos:
+                    return arquivos[file_id]
+        raise FileNotFoundError(file_id)
+
+    def buscar(self, meta):
+        extensao = os.path.splitext(meta['name'])[1] or ".dxf"
+        caminho = cache_drive.obter_do_cache(meta['id'], meta['md5Checksum'], extensao)
+        if caminho:
+            return caminho
+        _, conteudo = self._conteudo(meta['id'])
+        return cache_drive.salvar_no_cache(meta['id'], meta['md5Checksum'], conteudo, extensao)
+
+    def enviar(self, caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+        with open(caminho, 'rb') as f:
+            return self.adicionar(pasta, nome, f.read(), file_id)
+
+    def mover(self, file_ids, destino, origem):
+        erros = []
+        with self._lock:
+            arquivos_origem = self.pastas.get(origem, {})
+            arquivos_destino = self.pastas.setdefault(destino, {})
+            for file_id in file_ids:
+                if file_id in arquivos_origem:
+                    arquivos_destino[file_id] = arquivos_origem.pop(file_id)
+                else:
+                    erros.append((file_id, FileNotFoundError(f"{file_id} não está em {origem}.")))
+        return erros
+
+    def url_publica(self, file_id):
+        return f"memoria://{file_id}"
+
+
+_armazenamento = None
+_armazenamento_lock = threading.Lock()
+
+
+def criar_armazenamento(tipo=None, raiz=None):
+    tipo = tipo or ARMAZENAMENTO
+    raiz = raiz if raiz is not None else ARMAZENAMENTO_DIR
+    if tipo == "drive":
+        return ArmazenamentoDrive()
+    if tipo == "local":
+        if not raiz:
+            raise Exception("ARMAZENAMENTO=local exige a variável ARMAZENAMENTO_DIR.")
+        return ArmazenamentoLocal(raiz)
+    if tipo == "memoria":
+        armazenamento = ArmazenamentoMemoria()
+        if raiz:
+            armazenamento.semear(raiz)
+        return armazenamento
+    raise Exception(f"ARMAZENAMENTO inválido: {tipo} (use drive, local ou memoria).")
+
+
+def obter_armazenamento():
+    global _armazenamento
+    with _armazenamento_lock:
+        if _armazenamento is None:
+            _armazenamento = criar_armazenamento()
+        return _armazenamento
+
+
+def definir_armazenamento(armazenamento):
+    """Troca a implementação em uso (testes e benchmarks)."""
+    global _armazenamento
+    with _armazenamento_lock:
+        _armazenamento = armazenamento
+
+
+# --- OPERAÇÕES USADAS PELA API ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ARMAZENAMENTO_WORKERS, thread_name_prefix="armazenamento")
+        return _pool
+
+
+@cronometrado("armazenamento_buscar")
+def buscar(meta):
+    return obter_armazenamento().buscar(meta)
+
+
+def buscar_em_segundo_plano(meta):
+    return _obter_pool().submit(buscar, meta)
+
+
+def baixar_arquivo(nome_arquivo, pasta=PASTA_PADRONIZADOS):
+    """Baixa (ou encontra no cache) e retorna o caminho local de um arquivo da pasta."""
+    meta = obter_armazenamento().stat(pasta, nome_arquivo)
+    if meta is None:
+        raise FileNotFoundError(f"{nome_arquivo} não encontrado no armazenamento.")
+    return buscar(meta)
+
+
+def baixar_varios(nomes, pasta=PASTA_PADRONIZADOS):
+    """
+    Baixa (ou encontra no cache) vários arquivos da pasta em paralelo.
+    Gera pares (nome, caminho_local) conforme cada download termina.
+    """
+    futures = {_obter_pool().submit(baixar_arquivo, nome, pasta): nome for nome in nomes}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
+
+
+def arquivos_faltando(nomes, pasta=PASTA_PADRONIZADOS):
+    """Retorna, na ordem recebida, os nomes que não existem na pasta (uma diferença de conjuntos sobre o índice)."""
+    armazenamento = obter_armazenamento()
+    indice = armazenamento.indice(pasta)
+    if set(nomes) - indice.keys():
+        indice = armazenamento.indice(pasta, forcar=True)
+    return [nome for nome in nomes if nome not in indice]
+
+
+def nomes_com_prefixo(prefixo, pasta=PASTA_SAIDA):
+    """Nomes dos arquivos da pasta que começam com o prefixo."""
+    return [meta['name'] for meta in obter_armazenamento().listar_com_prefixos(pasta, [prefixo]) if meta['name'].startswith(prefixo)]
+
+
+def url_publica(file_id):
+    return obter_armazenamento().url_publica(file_id)
+
+
+def reservar_ids(quantidade):
+    """Reserva IDs para criar os arquivos depois com URL já conhecida."""
+    return obter_armazenamento().reservar_ids(quantidade)
+
+
+@cronometrado("armazenamento_enviar")
+def enviar(caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+    return obter_armazenamento().enviar(caminho, nome, pasta, file_id)
+
+
+def enviar_em_segundo_plano(caminho, nome, pasta=PASTA_SAIDA, file_id=None):
+    """Agenda o upload no pool e retorna um Future com o ID do arquivo criado (ainda sem link público)."""
+    return _obter_pool().submit(enviar, caminho, nome, pasta, file_id)
+
+
+def publicar_arquivos(file_ids):
+    return obter_armazenamento().publicar(file_ids)
+
+
+def enviar_arquivo(caminho, nome):
+    """Faz upload de arquivo e retorna URL pública"""
+    return publicar_arquivos([enviar(caminho, nome)])[0]
+
+
+# --- ARQUIVAMENTO ---
+def _data_do_plano(nome):
+    """
+    Data (dd-mm-aaaa) do nome 'Plano de corte ... <data>[_NN].dxf|.png', ou None se o nome não segue o padrão.
+    O sufixo _NN dos planos seguintes do mesmo dia não faz parte da data.
+    """
+    if not nome.startswith('Plano de corte '):
+        return None
+    parts = nome.rsplit(' ', 1)
+    if len(parts) != 2:
+        return None
+    data = re.match(r"\d{2}-\d{2}-\d{4}", parts[1])
+    return data.group(0) if data else None
+
+
+LIMITE_LOTE_MOVER = 100
+
+
+def mover_arquivos_antigos(progresso=None):
+    """
+    Move arquivos .dxf e .png com data diferente da atual para a pasta 'arquivo morto', em lotes.
+    Retorna {'moved': total movido, 'por_data': {data: quantidade}, 'falhas': quantidade}.
+    """
+    armazenamento = obter_armazenamento()
+    hoje = datetime.datetime.now().strftime("%d-%m-%Y")
+    antigos = []
+    for meta in armazenamento.listar_com_prefixos(PASTA_SAIDA, ['Plano de corte ']):
+        data = _data_do_plano(meta['name'])
+        if data is not None and data != hoje:
+            antigos.append((meta['id'], data))
+
+    por_data = {}
+    falhas = []
+    for inicio in range(0, len(antigos), LIMITE_LOTE_MOVER):
+        lote = antigos[inicio:inicio + LIMITE_LOTE_MOVER]
+        erros = armazenamento.mover([file_id for file_id, _ in lote], PASTA_ARQUIVO_MORTO, PASTA_SAIDA)
+        falhas.extend(erros)
+        com_erro = {file_id for file_id, _ in erros}
+        for file_id, data in lote:
+            if file_id not in com_erro:
+                por_data[data] = por_data.get(data, 0) + 1
+        if progresso is not None:
+            progresso({"tipo": "etapa", "etapa": "arquivamento", "processados": inicio + len(lote), "total": len(antigos)})
+
+    if falhas:
+        print(f"[ARQUIVO MORTO] {len(falhas)} arquivo(s) não foram movidos: {falhas[0][1]}")
+    moved = sum(por_data.values())
+    return {'moved': moved, 'por_data': dict(sorted(por_data.items(), key=lambda item: item[0].split('-')[::-1])), 'falhas': len(falhas)}
+
+
+# --- PLACAS PERSONALIZADAS ---
+def _padrao_personalizado(target_id):
+    # Regex rigoroso: ID + (espaços) + hífen + (espaços) + 'Arquivo Personalizado' + (tudo liberado) + '.dxf'
+    # O re.IGNORECASE garante que não importa maiúsculas ou minúsculas
+    return re.compile(rf"^{re.escape(target_id)}\s*-\s*arquivo personalizado.*\.dxf$", re.IGNORECASE)
+
+
+def resolver_dxfs_personalizados(target_ids):
+    """
+    Encontra os arquivos personalizados de vários IDs na pasta de placas, sem baixar nada.
+    Retorna {target_id: metadados ou None}.
+    """
+    unicos = list(dict.fromkeys(target_ids))
+    arquivos = obter_armazenamento().listar_com_prefixos(PASTA_PLACAS, unicos) if unicos else []
+
+    # Para cada ID vale o primeiro arquivo da listagem que bate 100% com as regras de nome
+    escolhidos = {}
+    for target_id in unicos:
+        padrao = _padrao_personalizado(target_id)
+        escolhidos[target_id] = next((arq for arq in arquivos if padrao.match(arq['name'])), None)
+    return escolhidos
+
+
+def buscar_dxfs_personalizados(target_ids):
+    """
+    Versão em lote do buscar_dxf_personalizado: resolve todos os IDs (resolver_dxfs_personalizados)
+    e baixa os arquivos encontrados em paralelo. Retorna {target_id: (caminho_local, nome)},
+    com (None, None) para os não encontrados.
+    """
+    escolhidos = resolver_dxfs_personalizados(target_ids)
+    downloads = {target_id: buscar_em_segundo_plano(arq) for target_id, arq in escolhidos.items() if arq is not None}
+    resultado = {}
+    for target_id, arq in escolhidos.items():
+        resultado[target_id] = (downloads[target_id].result(), arq['name']) if arq is not None else (None, None)
+    return resultado
+
+
+def buscar_dxf_personalizado(target_id: str):
+    """
+    Busca o DXF na pasta específica de placas e garante a nomenclatura correta usando Regex.
+    """
+    return buscar_dxfs_personalizados([target_id])[target_id]
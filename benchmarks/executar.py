@@ -0,0 +1,220 @@
+"""
+Benchmarks offline das etapas pesadas da API: leitura das peças, composição dos planos (18, 32 e grade
+customizada), preview PNG, limpeza das placas e extração das placas, além da partida a frio da API
+(benchmarks/inicializacao.py). Tudo roda contra o armazenamento em memória, sem rede. O resultado sai em JSON e pode ser comparado com uma execução anterior:
+
+    python -m benchmarks.executar --saida base.json
+    python -m benchmarks.executar --comparar base.json --tolerancia 0.2   # sai com código 1 se houver regressão
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import gc
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import subprocess
+from types import SimpleNamespace
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+
+def medir(funcao, repeticoes, preparar=None, aquecimento=1):
+    """
+    Executa funcao() `repeticoes` vezes (preparar() antes de cada uma, fora do tempo). Retorna os tempos em ms.
+    As primeiras `aquecimento` execuções são descartadas (imports tardios, caches do interpretador).
+    O coletor de lixo roda antes de cada execução, fora do tempo.
+    """
+    tempos = []
+    for _ in range(aquecimento + repeticoes):
+        if preparar is not None:
+            preparar()
+        gc.collect()  # o lixo das execuções anteriores não é coletado dentro do tempo desta
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos[aquecimento:]
+
+
+def resumo(etapa, layout, variante, tempos, **extra):
+    return {
+        "etapa": etapa,
+        "layout": layout,
+        "variante": variante,
+        "repeticoes": len(tempos),
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        **extra,
+    }
+
+
+def _versao_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_REPO, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def executar(args):
+    trabalho = tempfile.mkdtemp(prefix="bench_planos_")
+    # O cache em disco precisa ser configurado antes de importar os módulos da API
+    os.environ["DXF_CACHE_DIR"] = os.path.join(trabalho, "cache")
+
+    import ezdxf
+    from armazenamento import ArmazenamentoMemoria, definir_armazenamento, PASTA_PADRONIZADOS
+    from biblioteca_blocos import BibliotecaBlocos
+    from cache_pecas import preparar_peca, limpar_cache_pecas
+    from sprites_pecas import limpar_cache_sprites
+    from compose_dxf import compor_plano, gerar_imagem_perfil
+    from perfis_maquinas import PERFIS, perfil_customizado
+    from detects_plaque import limpar_dxf_placas, extrair_placas_de_arquivo_local
+    from benchmarks.gerador_dxf import gerar_etiquetas, gerar_personalizado, grade_customizada
+
+    try:
+        pasta_etiquetas = os.path.join(trabalho, PASTA_PADRONIZADOS)
+        nomes = gerar_etiquetas(pasta_etiquetas, args.etiquetas, args.entidades)
+        armazenamento = ArmazenamentoMemoria()
+        armazenamento.semear(trabalho)
+        definir_armazenamento(armazenamento)
+
+        coordenadas, chapa = grade_customizada(args.colunas, args.linhas)
+        layouts = {
+            "18": PERFIS["18"],
+            "32": PERFIS["32"],
+            f"custom-{args.colunas}x{args.linhas}": perfil_customizado(coordenadas, chapa),
+        }
+
+        resultados = []
+
+        tempos = medir(lambda: preparar_peca(os.path.join(pasta_etiquetas, nomes[0])), args.repeticoes)
+        resultados.append(resumo("preparar_peca", None, "etiqueta", tempos, entidades=args.entidades))
+
+        for nome_layout, perfil in layouts.items():
+            posicoes = sorted(perfil.coordenadas)
+            lista = [SimpleNamespace(nome=nomes[i % len(nomes)], posicao=pos) for i, pos in enumerate(posicoes)]
+            saida = os.path.join(trabalho, f"plano_{nome_layout}.dxf")
+
+            def compor():
+                compor_plano(perfil, lista, saida, biblioteca=BibliotecaBlocos(), gerar_png=False)
+
+            def esfriar():
+                limpar_cache_pecas()
+                limpar_cache_sprites()
+
+            tempos = medir(compor, args.repeticoes, preparar=esfriar)
+            resultados.append(resumo("compor_plano", nome_layout, "frio", tempos, posicoes=len(posicoes)))
+            tempos = medir(compor, args.repeticoes)
+            resultados.append(resumo("compor_plano", nome_layout, "quente", tempos, posicoes=len(posicoes)))
+
+            biblioteca = BibliotecaBlocos()
+            tempos = medir(lambda: gerar_imagem_perfil(perfil, saida, lista, enviar=False, biblioteca=biblioteca), args.repeticoes, preparar=esfriar)
+            resultados.append(resumo("gerar_imagem", nome_layout, "frio", tempos, posicoes=len(posicoes)))
+            tempos = medir(lambda: gerar_imagem_perfil(perfil, saida, lista, enviar=False, biblioteca=biblioteca), args.repeticoes)
+            resultados.append(resumo("gerar_imagem", nome_layout, "quente", tempos, posicoes=len(posicoes)))
+
+        personalizado = gerar_personalizado(os.path.join(trabalho, "BENCH - Arquivo Personalizado.dxf"), args.placas, args.entidades_placa)
+        limpo = os.path.join(trabalho, "BENCH_limpo.dxf")
+        tempos = medir(lambda: limpar_dxf_placas(personalizado, limpo), args.repeticoes)
+        resultados.append(resumo("limpar_dxf_placas", None, "personalizado", tempos, placas=args.placas, entidades_placa=args.entidades_placa))
+
+        # As placas extraídas vão para /tmp (caminho_placa), fora da pasta de trabalho: são apagadas
+        # antes de cada repetição (fora do tempo) e no final
+        extraidas = []
+
+        def apagar_extraidas():
+            while extraidas:
+                os.remove(extraidas.pop())
+
+        def extrair():
+            extraidas.extend(p["caminho_dxf"] for p in extrair_placas_de_arquivo_local(personalizado, "BENCH")["placas"])
+
+        try:
+            tempos = medir(extrair, args.repeticoes, preparar=apagar_extraidas)
+        finally:
+            apagar_extraidas()
+        resultados.append(resumo("extrair_placas", None, "personalizado", tempos, placas=args.placas, entidades_placa=args.entidades_placa))
+    finally:
+        shutil.rmtree(trabalho, ignore_errors=True)
+
+    if not args.sem_inicializacao:
+        from benchmarks.inicializacao import medir as medir_inicializacao
+        resultados.extend(medir_inicializacao(args.repeticoes))
+
+    return {
+        "versao": _versao_git(),
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "ezdxf": ezdxf.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parametros": vars(args) | {"saida": None, "comparar": None},
+        "resultados": resultados,
+    }
+
+
+def _chave(resultado):
+    return resultado["etapa"], resultado["layout"], resultado["variante"]
+
+
+def comparar(atual, base, tolerancia):
+    """
+    Lista as etapas cujo menor tempo piorou mais que a tolerância (fração) em relação à execução base.
+    O mínimo é o que menos sofre com ruído da máquina; a mediana oscila demais para poucas repetições.
+    """
+    anteriores = {_chave(r): r for r in base["resultados"]}
+    regressoes = []
+    for resultado in atual["resultados"]:
+        anterior = anteriores.get(_chave(resultado))
+        if anterior is None or anterior["min_ms"] <= 0:
+            continue
+        razao = resultado["min_ms"] / anterior["min_ms"]
+        if razao > 1 + tolerancia:
+            regressoes.append({"chave": _chave(resultado), "antes_ms": anterior["min_ms"], "agora_ms": resultado["min_ms"], "razao": round(razao, 3)})
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline de composição, detecção e renderização.")
+    parser.add_argument("--repeticoes", type=int, default=15, help="repetições medidas por etapa (após uma de aquecimento)")
+    parser.add_argument("--etiquetas", type=int, default=12, help="etiquetas padronizadas distintas")
+    parser.add_argument("--entidades", type=int, default=40, help="entidades de gravação por etiqueta")
+    parser.add_argument("--placas", type=int, default=12, help="placas no arquivo personalizado")
+    parser.add_argument("--entidades-placa", type=int, default=150, help="entidades de gravação por placa")
+    parser.add_argument("--colunas", type=int, default=6, help="colunas da grade customizada")
+    parser.add_argument("--linhas", type=int, default=4, help="linhas da grade customizada")
+    parser.add_argument("--sem-inicializacao", action="store_true", help="não mede a partida a frio da API")
+    parser.add_argument("--saida", help="grava o JSON neste arquivo (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora aceitável do menor tempo (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    # Só o JSON vai para o stdout: os avisos impressos pela API durante as medições vão para o stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        relatorio = executar(args)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regressoes = comparar(relatorio, json.load(f), args.tolerancia)
+        for r in regressoes:
+            print(f"[REGRESSÃO] {r['chave']}: {r['antes_ms']} ms -> {r['agora_ms']} ms ({r['razao']}x)", file=sys.stderr)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
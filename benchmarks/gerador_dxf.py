@@ -0,0 +1,87 @@
+import os
+import random
+import ezdxf
+
+from detects_plaque import LARGURA_PLACA, ALTURA_PLACA
+
+# Gerador de DXFs sintéticos para os benchmarks: etiquetas padronizadas (as peças dos planos)
+# e arquivos personalizados com N placas e M entidades de gravação por placa.
+
+CORES_ETIQUETA = ["DOU", "ROS", "PRA"]
+ESPACO_PLACAS = 40.0  # mm entre placas no arquivo personalizado
+
+
+def gerar_etiqueta(caminho, entidades=40, semente=0):
+    """Etiqueta no tamanho da placa, com contorno, `entidades` linhas/arcos de gravação, um círculo e um texto."""
+    r = random.Random(semente)
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    lx, ly = LARGURA_PLACA / 2, ALTURA_PLACA / 2
+    msp.add_lwpolyline([(-lx, -ly), (lx, -ly), (lx, ly), (-lx, ly)], close=True)
+    for i in range(entidades):
+        if i % 4 == 3:
+            msp.add_arc((r.uniform(-lx + 15, lx - 15), r.uniform(-ly + 15, ly - 15)), r.uniform(2, 12), r.uniform(0, 180), r.uniform(180, 360))
+        else:
+            msp.add_line((r.uniform(-lx + 2, lx - 2), r.uniform(-ly + 2, ly - 2)), (r.uniform(-lx + 2, lx - 2), r.uniform(-ly + 2, ly - 2)))
+    msp.add_circle((0, ly / 2), 10)
+    msp.add_text(f"ETQ {semente}", dxfattribs={'height': 6}).set_placement((-lx + 5, -ly + 5))
+    doc.saveas(caminho)
+    return caminho
+
+
+def gerar_etiquetas(pasta, quantidade, entidades=40):
+    """Gera `quantidade` etiquetas com os sufixos de cor usados no preview. Retorna os nomes."""
+    os.makedirs(pasta, exist_ok=True)
+    nomes = []
+    for i in range(quantidade):
+        nome = f"bench-etiqueta-{i:03d}-{CORES_ETIQUETA[i % len(CORES_ETIQUETA)]}.dxf"
+        gerar_etiqueta(os.path.join(pasta, nome), entidades, semente=i)
+        nomes.append(nome)
+    return nomes
+
+
+def gerar_personalizado(caminho, placas=12, entidades=150, colunas=4, semente=0):
+    """
+    Arquivo personalizado: `placas` retângulos amarelos (cor 2) em grade, cada um com `entidades`
+    entidades de gravação coloridas, mais ruído fora das placas (que a limpeza deve descartar).
+    """
+    r = random.Random(semente)
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    blk = doc.blocks.new("BENCH_ESTRELA")
+    blk.add_circle((0, 0), 3)
+    blk.add_line((-3, 0), (3, 0))
+    passo_x, passo_y = LARGURA_PLACA + ESPACO_PLACAS, ALTURA_PLACA + ESPACO_PLACAS
+    for i in range(placas):
+        x, y = (i % colunas) * passo_x, (i // colunas) * passo_y
+        msp.add_lwpolyline([(x, y), (x + LARGURA_PLACA, y), (x + LARGURA_PLACA, y + ALTURA_PLACA), (x, y + ALTURA_PLACA)], close=True, dxfattribs={'color': 2})
+        for k in range(entidades):
+            cor = r.choice([1, 3, 5])
+            if k % 10 == 9:
+                msp.add_blockref("BENCH_ESTRELA", (x + r.uniform(10, LARGURA_PLACA - 10), y + r.uniform(10, ALTURA_PLACA - 10)), dxfattribs={'color': cor})
+            elif k % 5 == 4:
+                msp.add_circle((x + r.uniform(15, LARGURA_PLACA - 15), y + r.uniform(15, ALTURA_PLACA - 15)), r.uniform(2, 10), dxfattribs={'color': cor})
+            else:
+                msp.add_line(
+                    (x + r.uniform(2, LARGURA_PLACA - 2), y + r.uniform(2, ALTURA_PLACA - 2)),
+                    (x + r.uniform(2, LARGURA_PLACA - 2), y + r.uniform(2, ALTURA_PLACA - 2)),
+                    dxfattribs={'color': cor},
+                )
+        msp.add_text(f"Nome {i}", dxfattribs={'height': 6}).set_placement((x + 10, y + ALTURA_PLACA - 30))
+    largura = colunas * passo_x
+    altura = ((placas + colunas - 1) // colunas) * passo_y
+    for _ in range(max(placas * 5, 20)):
+        msp.add_line((r.uniform(-500, largura + 500), r.uniform(-500, -50)), (r.uniform(-500, largura + 500), r.uniform(altura + 50, altura + 500)))
+    doc.saveas(caminho)
+    return caminho
+
+
+def grade_customizada(colunas, linhas, margem=60.0, espaco=15.0):
+    """Coordenadas {posição: [x, y]} (centro de cada etiqueta) e tamanho da chapa para uma grade colunas x linhas."""
+    passo_x, passo_y = LARGURA_PLACA + espaco, ALTURA_PLACA + espaco
+    coordenadas = {}
+    for linha in range(linhas):
+        for coluna in range(colunas):
+            coordenadas[linha * colunas + coluna + 1] = [margem + coluna * passo_x + LARGURA_PLACA / 2, margem + linha * passo_y + ALTURA_PLACA / 2]
+    chapa = [2 * margem + colunas * passo_x - espaco, 2 * margem + linhas * passo_y - espaco]
+    return coordenadas, chapa
@@ -0,0 +1,103 @@
+"""
+Tempo de partida a frio da API, em processos novos: importar main.py e subir o uvicorn até o primeiro
+/health responder. Roda com ARMAZENAMENTO=drive e sem credenciais, o que também confirma que a
+partida não fala com o Drive. Entra no relatório de benchmarks.executar; sozinho:
+
+    python -m benchmarks.inicializacao --repeticoes 5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+# Módulos que a partida não deveria carregar (importados só no primeiro uso)
+MODULOS_ADIADOS = ("PIL", "googleapiclient", "google.oauth2", "httplib2", "ezdxf.addons.drawing")
+
+_IMPORTAR_MAIN = f"""
+import sys, time, json
+inicio = time.perf_counter()
+import main
+duracao = (time.perf_counter() - inicio) * 1000
+print(json.dumps({{"ms": duracao, "carregados": [m for m in {MODULOS_ADIADOS!r} if m in sys.modules]}}))
+"""
+
+
+def _ambiente():
+    ambiente = dict(os.environ)
+    ambiente.pop("service_account.json", None)
+    ambiente.update(ARMAZENAMENTO="drive", DRIVE_FAKE="0", DRIVE_ESPELHO="0", ARQUIVAR_INTERVALO_HORAS="0")
+    return ambiente
+
+
+def medir_importacao():
+    """(ms para importar main num processo novo, módulos adiados que acabaram carregados)."""
+    saida = subprocess.run([sys.executable, "-c", _IMPORTAR_MAIN], cwd=RAIZ_REPO, env=_ambiente(),
+                           capture_output=True, text=True, check=True).stdout
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    return resultado["ms"], resultado["carregados"]
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_primeira_health(limite_segundos=60):
+    """ms entre iniciar o uvicorn e o primeiro 200 do /health."""
+    porta = _porta_livre()
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta), "--log-level", "warning"],
+        cwd=RAIZ_REPO, env=_ambiente(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < limite_segundos:
+            if processo.poll() is not None:
+                raise RuntimeError(f"uvicorn terminou com código {processo.returncode} antes do /health.")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/health", timeout=1) as resposta:
+                    if resposta.status == 200:
+                        return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/health não respondeu em {limite_segundos}s.")
+    finally:
+        processo.terminate()
+        processo.wait(timeout=10)
+
+
+def medir(repeticoes):
+    """Resultados no formato de benchmarks.executar (etapa "inicializacao")."""
+    from benchmarks.executar import resumo
+    importacoes, carregados = [], set()
+    for _ in range(repeticoes):
+        ms, modulos = medir_importacao()
+        importacoes.append(ms)
+        carregados.update(modulos)
+    healths = [medir_primeira_health() for _ in range(repeticoes)]
+    return [
+        resumo("inicializacao", None, "importar_main", importacoes, modulos_adiados_carregados=sorted(carregados)),
+        resumo("inicializacao", None, "primeira_health", healths),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo de partida a frio da API.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args(argv)
+    resultados = medir(args.repeticoes)
+    print(json.dumps(resultados, indent=2, ensure_ascii=False))
+    return 1 if resultados[0]["modulos_adiados_carregados"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
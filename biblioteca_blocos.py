@@ -0,0 +1,63 @@
+import os
+from armazenamento import baixar_arquivo
+from cache_pecas import obter_peca
+
+
+def nome_bloco(nome):
+    return f"BLK_{nome.replace('.','_')}"
+
+
+def copiar_blocos_referenciados(doc_origem, doc, entidades):
+    """Copia para doc as definições dos blocos usados pelas INSERTs (também as aninhadas) que ainda não existem nele."""
+    for ent in entidades:
+        if ent.dxftype() != 'INSERT':
+            continue
+        nome = ent.dxf.name
+        if nome in doc.blocks or nome not in doc_origem.blocks:
+            continue
+        origem = doc_origem.blocks[nome]
+        blk = doc.blocks.new(name=nome, base_point=origem.block.dxf.base_point)
+        for e in origem:
+            try:
+                blk.add_entity(e.copy())
+            except Exception:
+                pass
+        copiar_blocos_referenciados(doc_origem, doc, origem)
+
+
+class BibliotecaBlocos:
+    """
+    Biblioteca de peças de uma requisição: cada nome é resolvido para um arquivo local uma única vez
+    e todos os planos da requisição reaproveitam essa resolução. A geometria preparada vem do
+    cache de peças do processo, então cada peça é lida uma vez por processo.
+    Serializável (só guarda caminhos), para seguir junto com os planos para o pool de processos.
+    """
+
+    def __init__(self, caminhos=None, subpasta='arquivos padronizados'):
+        self.caminhos = dict(caminhos or {})
+        self.subpasta = subpasta
+
+    def caminho(self, nome):
+        path = self.caminhos.get(nome)
+        if path is None or not os.path.exists(path):
+            # Arquivos gerados localmente (ex.: placas limpas) têm prioridade sobre o Drive
+            path = f"/tmp/{nome}"
+            if not os.path.exists(path):
+                path = baixar_arquivo(nome, pasta=self.subpasta)
+            self.caminhos[nome] = path
+        return path
+
+    def peca(self, nome):
+        return obter_peca(self.caminho(nome))
+
+    def definir_bloco(self, doc, nome):
+        """Garante a definição BLK_<nome> no documento (uma vez por documento) e retorna o nome do bloco."""
+        nome_blk = nome_bloco(nome)
+        if nome_blk not in doc.blocks:
+            peca = self.peca(nome)
+            blk = doc.blocks.new(name=nome_blk)
+            for ne in peca.copiar_entidades():
+                blk.add_entity(ne)
+            # Peças com blocos próprios (ex.: o overlay das placas) levam as definições junto
+            copiar_blocos_referenciados(peca.doc, doc, peca.entidades)
+        return nome_blk
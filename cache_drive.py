@@ -0,0 +1,63 @@
+import os
+import threading
+import tempfile
+
+# Cache em disco dos arquivos baixados do Drive, endereçado por conteúdo (ID do arquivo + md5Checksum).
+# Um arquivo alterado no Drive muda de md5 e vira outra entrada; as antigas saem pela política LRU.
+CACHE_DIR = os.getenv("DXF_CACHE_DIR", "/tmp/dxf_cache")
+CACHE_MAX_BYTES = int(float(os.getenv("DXF_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+_lock = threading.Lock()
+
+
+def caminho_cache(file_id, md5, extensao=".dxf"):
+    return os.path.join(CACHE_DIR, f"{file_id}-{md5}{extensao}")
+
+
+def obter_do_cache(file_id, md5, extensao=".dxf"):
+    """Retorna o caminho local se a versão (file_id, md5) já está em cache, ou None."""
+    if not md5:
+        return None
+    caminho = caminho_cache(file_id, md5, extensao)
+    try:
+        # O mtime marca o último uso: é ele que a remoção LRU ordena
+        os.utime(caminho, None)
+    except FileNotFoundError:
+        return None
+    return caminho
+
+
+def salvar_no_cache(file_id, md5, data, extensao=".dxf"):
+    """Grava os bytes no cache (escrita atômica) e aplica o limite de tamanho. Retorna o caminho."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    caminho = caminho_cache(file_id, md5, extensao)
+    fd, caminho_tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(caminho_tmp, caminho)
+    remover_excedente(preservar=caminho)
+    return caminho
+
+
+def remover_excedente(preservar=None):
+    """Remove as entradas usadas há mais tempo até o cache caber em CACHE_MAX_BYTES."""
+    with _lock:
+        try:
+            entradas = [e for e in os.scandir(CACHE_DIR) if e.is_file() and not e.name.endswith(".part")]
+        except FileNotFoundError:
+            return 0
+        stats = [(e.path, e.stat()) for e in entradas]
+        total = sum(st.st_size for _, st in stats)
+        removidos = 0
+        for caminho, st in sorted(stats, key=lambda item: item[1].st_mtime):
+            if total <= CACHE_MAX_BYTES:
+                break
+            if caminho == preservar:
+                continue
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= st.st_size
+            removidos += 1
+        return removidos
@@ -0,0 +1,78 @@
+import os
+import threading
+from collections import OrderedDict
+import ezdxf
+
+from metricas import cronometrado
+
+# Cache em memória (LRU, por processo) das peças já lidas.
+# A chave é a versão do arquivo (caminho + mtime + tamanho): um arquivo regravado vira outra entrada.
+PECAS_CACHE_MAX = int(os.getenv("PECAS_CACHE_MAX", "256"))
+
+_pecas = OrderedDict()
+_lock = threading.Lock()
+
+
+class PecaPreparada:
+    """Entidades de uma peça já lidas, prontas para serem clonadas em um plano."""
+    __slots__ = ("doc", "entidades")
+
+    def __init__(self, doc, entidades):
+        self.doc = doc  # mantém vivo o documento de origem (tabelas, estilos) das entidades
+        self.entidades = entidades
+
+    def copiar_entidades(self, dx=0, dy=0):
+        """Gera cópias das entidades, deslocadas de (dx, dy)."""
+        for ent in self.entidades:
+            try:
+                ne = ent.copy()
+                if dx or dy:
+                    ne.translate(dx, dy, 0)
+                yield ne
+            except Exception:
+                pass
+
+
+def chave_versao(caminho):
+    st = os.stat(caminho)
+    return (os.path.realpath(caminho), st.st_mtime_ns, st.st_size)
+
+
+@cronometrado("ler_peca")
+def preparar_peca(caminho):
+    """
+    Lê o DXF e copia as entidades do modelspace uma única vez. As peças padronizadas já vêm
+    desenhadas em torno da origem, que é o ponto de inserção usado nos planos.
+    """
+    doc = ezdxf.readfile(caminho)
+    entidades = []
+    for ent in doc.modelspace():
+        try:
+            entidades.append(ent.copy())
+        except Exception:
+            pass
+    return PecaPreparada(doc, entidades)
+
+
+def obter_peca(caminho):
+    """Retorna a peça preparada do cache, lendo o arquivo apenas na primeira vez (ou quando ele muda)."""
+    chave = chave_versao(caminho)
+    with _lock:
+        peca = _pecas.get(chave)
+        if peca is not None:
+            _pecas.move_to_end(chave)
+            return peca
+
+    peca = preparar_peca(caminho)
+
+    with _lock:
+        _pecas[chave] = peca
+        _pecas.move_to_end(chave)
+        while len(_pecas) > PECAS_CACHE_MAX:
+            _pecas.popitem(last=False)
+    return peca
+
+
+def limpar_cache_pecas():
+    with _lock:
+        _pecas.clear()
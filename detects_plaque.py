@@ -5,19 +5,170 @@ import logging
 import unicodedata
 import os
 import base64
+import math
+import shutil
+import threading
+import numpy as np
+from functools import lru_cache
+from collections import defaultdict, OrderedDict
+
+from metricas import cronometrado
+from perfilador import perfilado
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-try:
-    from ezdxf.addons.drawing import RenderContext, Frontend
-    from ezdxf.addons.drawing.svg import SVGBackend
-    from ezdxf.addons.drawing.layout import Page
-    CAN_DRAW_SVG = True
-except ImportError:
-    CAN_DRAW_SVG = False
-    logger.warning("Módulo ezdxf.addons.drawing não disponível. SVGs não serão gerados.")
+# O addon de desenho (SVG) do ezdxf só é importado no primeiro SVG, fora da inicialização da API
+_addon_svg = None
+_addon_svg_lock = threading.Lock()
+# O frontend de desenho do ezdxf não é seguro entre threads (as fontes do fontTools são carregadas sob demanda
+# e compartilhadas): SVGs das placas e sprites das peças (sprites_pecas.py) desenham um por vez.
+desenho_lock = threading.Lock()
+
+def _obter_addon_svg():
+    """(RenderContext, Frontend, SVGBackend, Page) do addon de desenho, ou None se ele não estiver disponível."""
+    global _addon_svg
+    with _addon_svg_lock:
+        if _addon_svg is None:
+            try:
+                from ezdxf.addons.drawing import RenderContext, Frontend
+                from ezdxf.addons.drawing.svg import SVGBackend
+                from ezdxf.addons.drawing.layout import Page
+                _addon_svg = (RenderContext, Frontend, SVGBackend, Page)
+            except ImportError:
+                _addon_svg = ()
+                logger.warning("Módulo ezdxf.addons.drawing não disponível. SVGs não serão gerados.")
+        return _addon_svg or None
+
+# Placa: retângulo amarelo (cor 2) de 129 x 187.8 mm, em pé ou deitado
+LARGURA_PLACA, ALTURA_PLACA = 129.0, 187.8
+TOL_PLACA = 0.5    # mm
+MARGEM_CAIXA = 1.0  # folga (mm) da caixa usada para recortar o conteúdo de cada placa
+CELULA_GRADE = 200.0  # mm; lado da célula do índice espacial usado para achar a placa de cada entidade
+
+# Overlay desenhado sobre cada placa: lido e medido uma vez, inserido como bloco (uma referência por placa).
+# EXPLODIR_SOBREPOR=1 troca as referências por entidades soltas, para cortadoras que não aceitam blocos.
+ARQUIVO_SOBREPOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DXF Arquivos", "Placa_Sobrepor.dxf")
+BLOCO_SOBREPOR = "PLACA_SOBREPOR"
+EXPLODIR_SOBREPOR = os.getenv("EXPLODIR_SOBREPOR", "0") == "1"
+
+def carregar_sobrepor(caminho=ARQUIVO_SOBREPOR):
+    """Entidades do overlay já centralizadas na origem (o ponto de inserção do bloco), ou None se não houver overlay."""
+    if not os.path.exists(caminho):
+        return None
+    try:
+        msp = ezdxf.readfile(caminho).modelspace()
+        bb = bbox.extents(msp)
+        if not bb.has_data:
+            return None
+        entidades = []
+        for ent in msp:
+            try:
+                novo_ent = ent.copy()
+                novo_ent.translate(-bb.center.x, -bb.center.y, 0)
+                entidades.append(novo_ent)
+            except Exception: pass
+        return entidades
+    except Exception as e:
+        logger.error(f"Erro ao ler overlay {caminho}: {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def obter_sobrepor():
+    """Overlay lido na primeira placa gerada (e não na importação do módulo)."""
+    return carregar_sobrepor()
+
+def inserir_sobrepor(doc, x, y, explodir=None):
+    """
+    Coloca o overlay centrado em (x, y) no modelspace como referência ao bloco PLACA_SOBREPOR,
+    definido uma vez por documento. Retorna as entidades adicionadas (a referência ou, explodida, as soltas).
+    """
+    sobrepor = obter_sobrepor()
+    if not sobrepor:
+        return []
+    if BLOCO_SOBREPOR not in doc.blocks:
+        blk = doc.blocks.new(name=BLOCO_SOBREPOR)
+        for ent in sobrepor:
+            blk.add_entity(ent.copy())
+    ref = doc.modelspace().add_blockref(BLOCO_SOBREPOR, (x, y))
+    if EXPLODIR_SOBREPOR if explodir is None else explodir:
+        return list(ref.explode())
+    return [ref]
+
+def detectar_placas(msp):
+    """
+    Encontra as placas do modelspace em uma única passada vetorizada: os vértices das LWPOLYLINEs
+    candidatas (cor 2, 4 ou 5 vértices) vão para um array (N, 5, 2) e fechamento, tamanho e
+    orientação são testados de uma vez. Retorna (caixas, centros), na ordem do modelspace;
+    cada caixa é (x1, y1, x2, y2) já com a MARGEM_CAIXA.
+    """
+    vertices = []
+    fechadas = []
+    for entity in msp.query('LWPOLYLINE[color==2]'):
+        pts = entity.lwpoints.values[:, :2]
+        if len(pts) == 4:
+            # Repetir o 1º vértice não muda os extremos e deixa todas as candidatas com 5 vértices
+            vertices.append(np.vstack((pts, pts[:1])))
+            fechadas.append(entity.closed)
+        elif len(pts) == 5:
+            vertices.append(pts)
+            fechadas.append(entity.closed or bool((pts[0] == pts[-1]).all()))
 
+    if not vertices:
+        return [], []
+
+    v = np.stack(vertices)
+    minimos, maximos = v.min(axis=1), v.max(axis=1)
+    largura, altura = (maximos - minimos).T
+    em_pe = (np.abs(largura - LARGURA_PLACA) <= TOL_PLACA) & (np.abs(altura - ALTURA_PLACA) <= TOL_PLACA)
+    deitada = (np.abs(largura - ALTURA_PLACA) <= TOL_PLACA) & (np.abs(altura - LARGURA_PLACA) <= TOL_PLACA)
+    placa = np.asarray(fechadas) & (em_pe | deitada)
+
+    minimos, maximos = minimos[placa], maximos[placa]
+    caixas = np.hstack((minimos - MARGEM_CAIXA, maximos + MARGEM_CAIXA))
+    centros = (minimos + maximos) / 2
+    return [tuple(c) for c in caixas.tolist()], [tuple(c) for c in centros.tolist()]
+
+def particionar_por_placa(entidades, caixas):
+    """
+    Distribui as entidades entre as placas calculando a extensão de cada uma só uma vez.
+    As caixas vão para uma grade; cada entidade só é testada contra as placas da célula do seu
+    canto inferior esquerdo (uma entidade inteira dentro de uma caixa tem esse canto na caixa).
+    Retorna (por_placa, fora): por_placa[i] são as entidades da placa i, na ordem original;
+    entidades sem extensão entram em todas as placas e as que falham no cálculo vão para fora.
+    """
+    grade = defaultdict(list)
+    for i, (x1, y1, x2, y2) in enumerate(caixas):
+        for gx in range(math.floor(x1 / CELULA_GRADE), math.floor(x2 / CELULA_GRADE) + 1):
+            for gy in range(math.floor(y1 / CELULA_GRADE), math.floor(y2 / CELULA_GRADE) + 1):
+                grade[(gx, gy)].append(i)
+
+    por_placa = [[] for _ in caixas]
+    fora = []
+    cache = bbox.Cache()
+    for entity in entidades:
+        try:
+            bb = bbox.extents([entity], cache=cache)
+        except Exception:
+            fora.append(entity)
+            continue
+        if not bb.has_data:
+            for lista in por_placa:
+                lista.append(entity)
+            continue
+
+        min_x, min_y, max_x, max_y = bb.extmin.x, bb.extmin.y, bb.extmax.x, bb.extmax.y
+        dentro = False
+        for i in grade.get((math.floor(min_x / CELULA_GRADE), math.floor(min_y / CELULA_GRADE)), ()):
+            x1, y1, x2, y2 = caixas[i]
+            if min_x >= x1 and max_x <= x2 and min_y >= y1 and max_y <= y2:
+                por_placa[i].append(entity)
+                dentro = True
+        if not dentro:
+            fora.append(entity)
+    return por_placa, fora
+
+@cronometrado("contar_placas")
 def contar_placas_no_dxf(caminho_arquivo: str) -> int:
     try:
         doc = ezdxf.readfile(caminho_arquivo)
@@ -26,19 +177,8 @@ def contar_placas_no_dxf(caminho_arquivo: str) -> int:
         logger.error(f"Erro ao ler DXF {caminho_arquivo}: {e}")
         return 0
 
-    count = 0
-    for entity in msp.query('LWPOLYLINE'):
-        if entity.dxf.color != 2: continue
-        points = list(entity.get_points('xy'))
-        is_closed = entity.closed or (len(points) == 5 and points[0] == points[-1])
-        if not is_closed or len(points) not in (4, 5): continue
-        xs = [p[0] for p in points]
-        ys = [p[1] for p in points]
-        largura, altura = max(xs) - min(xs), max(ys) - min(ys)
-        tol = 0.5
-        if (abs(largura - 129.0) <= tol and abs(altura - 187.8) <= tol) or (abs(largura - 187.8) <= tol and abs(altura - 129.0) <= tol):
-            count += 1
-    return count
+    caixas, _ = detectar_placas(msp)
+    return len(caixas)
 
 def mapear_cor(cor_texto: str) -> str:
     if not cor_texto: return "PRA" 
@@ -48,43 +188,19 @@ def mapear_cor(cor_texto: str) -> str:
     elif "PRA" in cor_limpa: return "PRA"
     return "PRA"
 
+@cronometrado("limpar_placas")
 def limpar_dxf_placas(caminho_entrada: str, caminho_saida: str) -> int:
     try:
         doc = ezdxf.readfile(caminho_entrada)
         msp = doc.modelspace()
     except Exception as e:
         return 0
-    placas_boxes = []
-    centros_placas = []
-    for entity in msp.query('LWPOLYLINE'):
-        if entity.dxf.color == 2:
-            points = list(entity.get_points('xy'))
-            is_closed = entity.closed or (len(points) == 5 and points[0] == points[-1])
-            if is_closed and len(points) in (4, 5):
-                xs = [p[0] for p in points]
-                ys = [p[1] for p in points]
-                largura, altura = max(xs) - min(xs), max(ys) - min(ys)
-                tol = 0.5
-                if (abs(largura - 129.0) <= tol and abs(altura - 187.8) <= tol) or (abs(largura - 187.8) <= tol and abs(altura - 129.0) <= tol):
-                    placas_boxes.append((min(xs)-1, min(ys)-1, max(xs)+1, max(ys)+1))
-                    centros_placas.append(((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2))
-    
+    placas_boxes, centros_placas = detectar_placas(msp)
+
     qtd_placas = len(placas_boxes)
     if qtd_placas == 0: return 0
-    cache = bbox.Cache()
-    entities_to_delete = []
-    for entity in msp:
-        try:
-            bb = bbox.extents([entity], cache=cache)
-            if not bb.has_data: continue
-            dentro = False
-            for (px1, py1, px2, py2) in placas_boxes:
-                if (bb.extmin.x >= px1 and bb.extmax.x <= px2 and bb.extmin.y >= py1 and bb.extmax.y <= py2):
-                    dentro = True
-                    break
-            if not dentro: entities_to_delete.append(entity)
-        except Exception: entities_to_delete.append(entity)
-            
+    _, entities_to_delete = particionar_por_placa(msp, placas_boxes)
+
     for ent in entities_to_delete:
         try: msp.delete_entity(ent)
         except: pass
@@ -100,148 +216,185 @@ def limpar_dxf_placas(caminho_entrada: str, caminho_saida: str) -> int:
             try: ent.transform(m_mirror)
             except AttributeError: pass
                 
-        novos_centros = [(2 * cx_global - c[0], c[1]) for c in centros_placas]
-        pasta_base = os.path.dirname(os.path.abspath(__file__))
-        caminho_sobrepor = os.path.join(pasta_base, "DXF Arquivos", "Placa_Sobrepor.dxf")
-        if os.path.exists(caminho_sobrepor):
-            try:
-                doc_sobrepor = ezdxf.readfile(caminho_sobrepor)
-                msp_sobrepor = doc_sobrepor.modelspace()
-                cache_sob = bbox.Cache()
-                bb_sob = bbox.extents(msp_sobrepor, cache=cache_sob)
-                if bb_sob.has_data:
-                    for (nx, ny) in novos_centros:
-                        dx, dy = nx - bb_sob.center.x, ny - bb_sob.center.y
-                        for ent in msp_sobrepor:
-                            try:
-                                novo_ent = ent.copy()
-                                novo_ent.translate(dx, dy, 0)
-                                msp.add_entity(novo_ent)
-                            except Exception: pass
-            except Exception: pass
+        for cx_placa, cy_placa in centros_placas:
+            inserir_sobrepor(doc, 2 * cx_global - cx_placa, cy_placa)
     doc.saveas(caminho_saida)
     return qtd_placas
 
+def _analisar_em_lote(ids: list, funcao, *args) -> dict:
+    """
+    Resolve e baixa todos os IDs de uma vez (buscar_dxfs_personalizados) e executa
+    funcao(caminho_local, target_id, *args) para cada arquivo encontrado, na thread da requisição.
+    Retorna {target_id: (nome_arquivo, resultado)}, com resultado None para os IDs não encontrados.
+    """
+    from armazenamento import buscar_dxfs_personalizados
+    encontrados = buscar_dxfs_personalizados(ids)
+    return {
+        target_id: (nome_arquivo, funcao(caminho_local, target_id, *args) if caminho_local else None)
+        for target_id, (caminho_local, nome_arquivo) in encontrados.items()
+    }
+
+def _contar_placas(caminho_local: str, target_id: str) -> int:
+    return contar_placas_no_dxf(caminho_local)
+
+# Limpezas já feitas: (file_id, modifiedTime, cor) -> (caminho_limpo, qtd_placas)
+LIMPEZAS_CACHE_MAX = int(os.getenv("LIMPEZAS_CACHE_MAX", "256"))
+_limpezas = OrderedDict()
+_limpezas_lock = threading.Lock()
+
+def limpar_dxf_placas_cores(obter_entrada, versao, target_id: str, cores: list) -> tuple:
+    """
+    Limpa o arquivo de um ID uma única vez e deriva dele uma cópia por cor ({id}_limpo-{cor}.dxf).
+    O resultado é memorizado por versao (file_id, modifiedTime) + cor; obter_entrada() (o download)
+    só é chamada quando essa versão ainda não foi limpa para nenhuma cor.
+    Retorna (qtd_placas, {cor: nome_limpo}); sem placas no arquivo, nenhum arquivo é gerado.
+    """
+    nomes = {}
+    faltando = []
+    qtd_placas = None
+    origem = None  # arquivo já limpo desta versão, de onde as cores que faltam são copiadas
+    with _limpezas_lock:
+        for cor in dict.fromkeys(cores):
+            memo = _limpezas.get((*versao, cor))
+            if memo and (memo[0] is None or os.path.exists(memo[0])):
+                _limpezas.move_to_end((*versao, cor))
+                qtd_placas = memo[1]
+                if memo[0]:
+                    nomes[cor] = os.path.basename(memo[0])
+                    origem = memo[0]
+            else:
+                faltando.append(cor)
+        if faltando and qtd_placas is None:
+            # Nenhuma das cores pedidas foi limpa nesta versão, mas outra cor (de outro pedido) pode ter sido
+            for chave, memo in _limpezas.items():
+                if chave[:2] == tuple(versao) and (memo[0] is None or os.path.exists(memo[0])):
+                    qtd_placas, origem = memo[1], memo[0]
+                    break
+
+    if faltando:
+        caminho_base = f"/tmp/{target_id}_limpo-{faltando[0]}.dxf"
+        if origem:
+            # Outra cor desta mesma versão já foi limpa: basta copiar
+            shutil.copyfile(origem, caminho_base)
+        elif qtd_placas is None:
+            qtd_placas = limpar_dxf_placas(obter_entrada(), caminho_base)
+        if qtd_placas > 0:
+            for cor in faltando:
+                caminho_limpo = f"/tmp/{target_id}_limpo-{cor}.dxf"
+                if caminho_limpo != caminho_base:
+                    shutil.copyfile(caminho_base, caminho_limpo)
+                nomes[cor] = os.path.basename(caminho_limpo)
+
+        with _limpezas_lock:
+            for cor in faltando:
+                _limpezas[(*versao, cor)] = (f"/tmp/{nomes[cor]}" if cor in nomes else None, qtd_placas)
+                _limpezas.move_to_end((*versao, cor))
+            while len(_limpezas) > LIMPEZAS_CACHE_MAX:
+                _limpezas.popitem(last=False)
+
+    return qtd_placas, nomes
+
 def processar_ids_placas(ids: list) -> list:
-    from google_drive import buscar_dxf_personalizado
+    analises = _analisar_em_lote(ids, _contar_placas)
     resultados = []
     for target_id in ids:
-        caminho_local, nome_arquivo = buscar_dxf_personalizado(target_id)
-        if not caminho_local:
+        nome_arquivo, quantidade = analises[target_id]
+        if quantidade is None:
             resultados.append({"id": target_id, "status": "nao_encontrado", "quantidade": 0, "arquivo": None})
             continue
-        qtd_placas = contar_placas_no_dxf(caminho_local)
-        resultados.append({"id": target_id, "status": "sucesso", "quantidade": qtd_placas, "arquivo": nome_arquivo})
+        resultados.append({"id": target_id, "status": "sucesso", "quantidade": quantidade, "arquivo": nome_arquivo})
     return resultados
 
-def gerar_svg_base64(doc_dxf) -> str:
-    if not CAN_DRAW_SVG: return ""
+@cronometrado("svg_placa")
+def gerar_svg(doc_dxf) -> str:
+    addon = _obter_addon_svg()
+    if addon is None: return ""
+    RenderContext, Frontend, SVGBackend, Page = addon
     try:
         msp = doc_dxf.modelspace()
         ctx = RenderContext(doc_dxf)
         backend = SVGBackend()
-        Frontend(ctx, backend).draw_layout(msp)
+        with desenho_lock:
+            Frontend(ctx, backend).draw_layout(msp)
         page = Page(0, 0)
-        svg_string = backend.get_string(page)
-        return base64.b64encode(svg_string.encode('utf-8')).decode('utf-8')
+        return backend.get_string(page)
     except Exception as e:
-        logger.error(f"Erro ao gerar SVG Base64: {e}")
+        logger.error(f"Erro ao gerar SVG: {e}")
         return ""
 
-def extrair_placas_de_arquivo_local(caminho_local: str, target_id: str) -> dict:
-    """ Função unificada para abrir um arquivo local, cortar, espelhar e gerar os SVGs """
-    pasta_base = os.path.dirname(os.path.abspath(__file__))
-    caminho_sobrepor = os.path.join(pasta_base, "DXF Arquivos", "Placa_Sobrepor.dxf")
+def gerar_svg_base64(doc_dxf) -> str:
+    svg_string = gerar_svg(doc_dxf)
+    return base64.b64encode(svg_string.encode('utf-8')).decode('utf-8') if svg_string else ""
+
+def caminho_placa(target_id: str, index: int) -> str:
+    return f"/tmp/{target_id}_plate_{index}.dxf"
 
+@perfilado
+@cronometrado("extrair_placas")
+def extrair_placas_de_arquivo_local(caminho_local: str, target_id: str, incluir_svg: bool = False) -> dict:
+    """
+    Função unificada para abrir um arquivo local, cortar e espelhar as placas.
+    Os SVGs só são gerados aqui com incluir_svg=True; senão ficam para a rota de miniaturas.
+    """
     try:
         doc_main = ezdxf.readfile(caminho_local)
         msp_main = doc_main.modelspace()
     except Exception:
         return {"id": target_id, "status": "erro_leitura", "placas": []}
 
-    placas_boxes = []
-    centros_placas = []
-    for entity in msp_main.query('LWPOLYLINE'):
-        if entity.dxf.color == 2:
-            points = list(entity.get_points('xy'))
-            is_closed = entity.closed or (len(points) == 5 and points[0] == points[-1])
-            if is_closed and len(points) in (4, 5):
-                xs, ys = [p[0] for p in points], [p[1] for p in points]
-                largura, altura = max(xs) - min(xs), max(ys) - min(ys)
-                tol = 0.5
-                if (abs(largura - 129.0) <= tol and abs(altura - 187.8) <= tol) or (abs(largura - 187.8) <= tol and abs(altura - 129.0) <= tol):
-                    placas_boxes.append((min(xs)-1, min(ys)-1, max(xs)+1, max(ys)+1))
-                    centros_placas.append(((min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2))
+    placas_boxes, centros_placas = detectar_placas(msp_main)
 
     if not placas_boxes:
         return {"id": target_id, "status": "sem_placas", "placas": []}
 
     cx_global = sum(c[0] for c in centros_placas) / len(centros_placas)
+    m_mirror = Matrix44.chain(Matrix44.translate(-cx_global, 0, 0), Matrix44.scale(-1, 1, 1), Matrix44.translate(cx_global, 0, 0))
     placas_extraidas = []
-    cache_main = bbox.Cache()
-
-    for i, (bx1, by1, bx2, by2) in enumerate(placas_boxes):
-        caminho_temp = f"/tmp/{target_id}_plate_{i}.dxf"
-        doc_temp = ezdxf.readfile(caminho_local)
-        msp_temp = doc_temp.modelspace()
 
-        entities_to_delete = []
-        for entity in msp_temp:
-            try:
-                bb = bbox.extents([entity], cache=cache_main)
-                if not bb.has_data: continue
-                if not (bb.extmin.x >= bx1 and bb.extmax.x <= bx2 and bb.extmin.y >= by1 and bb.extmax.y <= by2):
-                    entities_to_delete.append(entity)
-            except Exception:
-                entities_to_delete.append(entity)
-
-        for ent in entities_to_delete:
-            try: msp_temp.delete_entity(ent)
-            except: pass
-
-        m_mirror = Matrix44.chain(Matrix44.translate(-cx_global, 0, 0), Matrix44.scale(-1, 1, 1), Matrix44.translate(cx_global, 0, 0))
-        for ent in msp_temp:
-            try: ent.transform(m_mirror)
-            except AttributeError: pass
+    # Arquivo lido uma vez: as entidades são separadas por placa e o modelspace é esvaziado;
+    # a cada placa ele recebe só cópias das entidades dela, é salvo e esvaziado de novo.
+    por_placa, _ = particionar_por_placa(msp_main, placas_boxes)
+    for ent in list(msp_main):
+        msp_main.unlink_entity(ent)
 
+    for i in range(len(placas_boxes)):
+        caminho_temp = caminho_placa(target_id, i)
         cx_placa, cy_placa = centros_placas[i]
-        nx, ny = 2 * cx_global - cx_placa, cy_placa 
+        nx, ny = 2 * cx_global - cx_placa, cy_placa
+        m_placa = Matrix44.chain(m_mirror, Matrix44.translate(-nx, -ny, 0))
 
-        if os.path.exists(caminho_sobrepor):
-            try:
-                doc_sobrepor = ezdxf.readfile(caminho_sobrepor)
-                msp_sobrepor = doc_sobrepor.modelspace()
-                bb_sob = bbox.extents(msp_sobrepor)
-                if bb_sob.has_data:
-                    dx, dy = nx - bb_sob.center.x, ny - bb_sob.center.y
-                    for ent in msp_sobrepor:
-                        novo_ent = ent.copy()
-                        novo_ent.translate(dx, dy, 0)
-                        msp_temp.add_entity(novo_ent)
-            except Exception: pass
-
-        m_to_origin = Matrix44.translate(-nx, -ny, 0)
-        for ent in msp_temp:
-            try: ent.transform(m_to_origin)
+        adicionadas = []
+        for ent in por_placa[i]:
+            try: novo_ent = ent.copy()
+            except Exception: continue
+            msp_main.add_entity(novo_ent)
+            adicionadas.append(novo_ent)
+            try: novo_ent.transform(m_placa)
             except AttributeError: pass
 
-        doc_temp.saveas(caminho_temp)
-        svg_b64 = gerar_svg_base64(doc_temp)
-        placas_extraidas.append({"index": i, "caminho_dxf": caminho_temp, "imagem": svg_b64})
+        # Depois de levar a placa para a origem, o centro dela (onde vai o overlay) é (0, 0)
+        adicionadas += inserir_sobrepor(doc_main, 0, 0)
+
+        doc_main.saveas(caminho_temp)
+        placa = {"index": i, "caminho_dxf": caminho_temp}
+        if incluir_svg:
+            placa["imagem"] = gerar_svg_base64(doc_main)
+        placas_extraidas.append(placa)
+
+        for ent in adicionadas:
+            msp_main.delete_entity(ent)
 
     return {"id": target_id, "status": "sucesso", "placas": placas_extraidas}
 
-def preparar_placas_pedido(ids: list) -> list:
-    from google_drive import buscar_dxf_personalizado
+def preparar_placas_pedido(ids: list, incluir_svg: bool = False) -> list:
+    analises = _analisar_em_lote(ids, extrair_placas_de_arquivo_local, incluir_svg)
     resultados = []
-    
+
     for target_id in ids:
-        caminho_local, nome_arquivo = buscar_dxf_personalizado(target_id)
-        if not caminho_local:
+        _, resultado = analises[target_id]
+        if resultado is None:
             resultados.append({"id": target_id, "status": "nao_encontrado", "placas": []})
             continue
-
-        res = extrair_placas_de_arquivo_local(caminho_local, target_id)
-        resultados.append(res)
+        resultados.append(resultado)
 
     return resultados
\ No newline at end of file
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import google_drive
+from armazenamento import buscar_em_segundo_plano
+from google_drive import obter_servico, executar, FOLDER_ID, FOLDER_ID_PLACAS, listar_pasta_paginado, obter_id_subpasta
+
+# Espelho local dos metadados das pastas usadas pela API (saída, "arquivos padronizados" e placas).
+# Uma listagem completa na partida e, depois, só o feed de mudanças do Drive (changes.list) aplicado
+# por uma thread em segundo plano. Os handlers leem os índices daqui em vez de listar o Drive.
+DRIVE_ESPELHO = os.getenv("DRIVE_ESPELHO", "0") == "1"
+DRIVE_ESPELHO_INTERVALO = float(os.getenv("DRIVE_ESPELHO_INTERVALO", "30"))
+# Baixa também o conteúdo dos arquivos padronizados novos/alterados para o cache em disco
+DRIVE_ESPELHO_CONTEUDO = os.getenv("DRIVE_ESPELHO_CONTEUDO", "0") == "1"
+
+CAMPOS_MUDANCAS = "nextPageToken,newStartPageToken,changes(fileId,removed,file(id,name,md5Checksum,modifiedTime,parents,trashed))"
+
+
+class EspelhoDrive:
+    def __init__(self, pastas, pastas_conteudo=()):
+        self.pastas = {pasta_id: {} for pasta_id in pastas}  # pasta_id -> {file_id: metadados}
+        self.pastas_conteudo = set(pastas_conteudo)
+        self._indices = {}  # pasta_id -> {nome: metadados}, refeito só depois de mudanças
+        self._token = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def espelha(self, pasta_id):
+        return pasta_id in self.pastas
+
+    def carregar(self):
+        """Pega o token antes de listar: o que mudar durante a listagem chega pelo feed depois."""
+        token = executar("changes.getStartPageToken", obter_servico().changes().getStartPageToken())['startPageToken']
+        for pasta_id in self.pastas:
+            arquivos = {arq['id']: arq for arq in listar_pasta_paginado(pasta_id)}
+            with self._lock:
+                self.pastas[pasta_id] = arquivos
+                self._indices.pop(pasta_id, None)
+            if pasta_id in self.pastas_conteudo:
+                self._baixar(arquivos.values())
+        self._token = token
+
+    def arquivos(self, pasta_id):
+        with self._lock:
+            return list(self.pastas[pasta_id].values())
+
+    def indice(self, pasta_id):
+        """{nome: metadados} da pasta; nomes duplicados mantêm o primeiro, como indice_pasta."""
+        with self._lock:
+            indice = self._indices.get(pasta_id)
+            if indice is None:
+                indice = {}
+                for arq in self.pastas[pasta_id].values():
+                    indice.setdefault(arq['name'], arq)
+                self._indices[pasta_id] = indice
+            return indice
+
+    def sincronizar(self):
+        """Aplica as mudanças desde o último token. Retorna quantas mudanças atingiram pastas espelhadas."""
+        with self._sync_lock:
+            aplicadas = 0
+            novos = []
+            page_token = self._token
+            while page_token:
+                response = executar("changes.list", obter_servico().changes().list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=CAMPOS_MUDANCAS,
+                ))
+                for mudanca in response.get('changes', []):
+                    atingiu, pasta_nova = self._aplicar(mudanca)
+                    aplicadas += atingiu
+                    if pasta_nova in self.pastas_conteudo:
+                        novos.append(mudanca['file'])
+                if 'newStartPageToken' in response:
+                    self._token = response['newStartPageToken']
+                page_token = response.get('nextPageToken')
+            self._baixar(novos)
+            return aplicadas
+
+    def _aplicar(self, mudanca):
+        file_id = mudanca['fileId']
+        arq = mudanca.get('file')
+        with self._lock:
+            # Remove de onde estiver (o arquivo pode ter sido movido de pasta) e recoloca nas pastas atuais
+            atingidas = {pasta_id for pasta_id, arquivos in self.pastas.items() if arquivos.pop(file_id, None)}
+            pasta_nova = None
+            if not mudanca.get('removed') and arq and not arq.get('trashed'):
+                for pasta_id in arq.get('parents', []):
+                    if pasta_id in self.pastas:
+                        self.pastas[pasta_id][file_id] = {k: arq[k] for k in ('id', 'name', 'md5Checksum', 'modifiedTime') if k in arq}
+                        atingidas.add(pasta_id)
+                        pasta_nova = pasta_id
+            for pasta_id in atingidas:
+                self._indices.pop(pasta_id, None)
+        return bool(atingidas), pasta_nova
+
+    def _baixar(self, arquivos):
+        for arq in arquivos:
+            buscar_em_segundo_plano(arq)
+
+    def _laco(self):
+        while not self._parar.wait(DRIVE_ESPELHO_INTERVALO):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                print(f"[ESPELHO] Falha ao sincronizar com o Drive: {e}")
+
+    def iniciar(self):
+        self.carregar()
+        self._thread = threading.Thread(target=self._laco, name="espelho-drive", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+_espelho = None
+_carga = None  # thread da carga inicial (iniciar_espelho_em_segundo_plano)
+_cancelado = threading.Event()
+
+
+def iniciar_espelho():
+    """Carrega o espelho, passa a atendê-lo em google_drive e inicia a sincronização periódica."""
+    global _espelho
+    if _espelho is not None:
+        return _espelho
+    padronizados = obter_id_subpasta("arquivos padronizados")
+    espelho = EspelhoDrive(
+        [FOLDER_ID, padronizados, FOLDER_ID_PLACAS],
+        pastas_conteudo=[padronizados] if DRIVE_ESPELHO_CONTEUDO else (),
+    )
+    espelho.iniciar()
+    google_drive.definir_espelho(espelho)
+    _espelho = espelho
+    print(f"[ESPELHO] {sum(len(a) for a in espelho.pastas.values())} arquivos espelhados; sincronizando a cada {DRIVE_ESPELHO_INTERVALO:g}s")
+    return espelho
+
+
+def iniciar_espelho_em_segundo_plano():
+    """
+    Carrega o espelho numa thread, sem segurar a partida da API (nem o /health):
+    até ele ficar pronto, as consultas vão direto ao Drive.
+    """
+    global _carga
+    if _carga is not None or _espelho is not None:
+        return
+    _cancelado.clear()
+
+    def _carregar():
+        try:
+            iniciar_espelho()
+        except Exception as e:
+            print(f"[ESPELHO] Falha ao carregar o espelho; as consultas seguem direto no Drive: {e}")
+            return
+        if _cancelado.is_set():
+            parar_espelho()
+
+    _carga = threading.Thread(target=_carregar, name="espelho-carga", daemon=True)
+    _carga.start()
+
+
+def estado_espelho():
+    """'pronto', 'carregando' ou 'desligado'."""
+    if _espelho is not None:
+        return "pronto"
+    if _carga is not None and _carga.is_alive():
+        return "carregando"
+    return "desligado"
+
+
+def parar_espelho():
+    global _espelho
+    _cancelado.set()
+    if _espelho is None:
+        return
+    google_drive.definir_espelho(None)
+    _espelho.parar()
+    _espelho = None
@@ -0,0 +1,232 @@
+import os
+import re
+import hashlib
+import datetime
+import itertools
+import threading
+
+# Substituto em memória do serviço do Google Drive (v3), para rodar a API e o espelho sem rede.
+# Implementa só o que o projeto usa: files (list/get/get_media/create/update/generateIds),
+# permissions.create, changes (getStartPageToken/list) e requisições em lote.
+# Ativado com DRIVE_FAKE=1 (ver google_drive.py).
+
+MIME_PASTA = "application/vnd.google-apps.folder"
+
+
+class _Requisicao:
+    def __init__(self, funcao):
+        self._funcao = funcao
+
+    def execute(self, http=None, num_retries=0):
+        return self._funcao()
+
+
+def _agora():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FakeDrive:
+    def __init__(self):
+        self.arquivos = {}  # id -> metadados + 'conteudo'
+        self.mudancas = []  # feed de mudanças; o page token é a posição nesta lista
+        self.permissoes = []
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    # --- Manipulação direta (testes e semeadura) ---
+
+    def adicionar(self, nome, pasta_id, conteudo=b'', mime_type="application/dxf", file_id=None):
+        with self._lock:
+            file_id = file_id or f"fake{next(self._ids)}"
+            self.arquivos[file_id] = {
+                'id': file_id,
+                'name': nome,
+                'mimeType': mime_type,
+                'parents': [pasta_id],
+                'trashed': False,
+                'md5Checksum': hashlib.md5(conteudo).hexdigest() if mime_type != MIME_PASTA else None,
+                'modifiedTime': _agora(),
+                'createdTime': _agora(),
+                'conteudo': conteudo,
+            }
+            self._registrar(file_id)
+            return file_id
+
+    def criar_pasta(self, nome, pai_id):
+        return self.adicionar(nome, pai_id, mime_type=MIME_PASTA)
+
+    def alterar(self, file_id, conteudo=None, nome=None):
+        with self._lock:
+            arq = self.arquivos[file_id]
+            if conteudo is not None:
+                arq['conteudo'] = conteudo
+                arq['md5Checksum'] = hashlib.md5(conteudo).hexdigest()
+            if nome is not None:
+                arq['name'] = nome
+            arq['modifiedTime'] = _agora()
+            self._registrar(file_id)
+
+    def excluir(self, file_id):
+        with self._lock:
+            self.arquivos.pop(file_id, None)
+            self.mudancas.append({'fileId': file_id, 'removed': True})
+
+    def _registrar(self, file_id):
+        self.mudancas.append({'fileId': file_id, 'removed': False})
+
+    def _metadados(self, arq):
+        return {k: v for k, v in arq.items() if k != 'conteudo' and v is not None}
+
+    # --- Consultas (subconjunto da sintaxe q do Drive usada pelo projeto) ---
+
+    def _atende(self, arq, q):
+        for pai in re.findall(r"'([^']+)' in parents", q):
+            if pai not in arq['parents']:
+                return False
+        m = re.search(r"name\s*=\s*'((?:[^'\\]|\\.)*)'", q)
+        if m and arq['name'] != m.group(1).replace("\\'", "'"):
+            return False
+        contem = [c.replace("\\'", "'") for c in re.findall(r"name contains '((?:[^'\\]|\\.)*)'", q)]
+        if contem and not any(c.lower() in arq['name'].lower() for c in contem):
+            return False
+        m = re.search(r"mimeType\s*=\s*'([^']+)'", q)
+        if m and arq['mimeType'] != m.group(1):
+            return False
+        if re.search(r"trashed\s*=\s*false", q) and arq['trashed']:
+            return False
+        return True
+
+    def files(self):
+        return self
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **kwargs):
+        def executar():
+            with self._lock:
+                encontrados = [self._metadados(a) for a in self.arquivos.values() if self._atende(a, q)]
+            inicio = int(pageToken or 0)
+            fim = inicio + min(pageSize or 100, 1000)
+            resposta = {'files': encontrados[inicio:fim]}
+            if fim < len(encontrados):
+                resposta['nextPageToken'] = str(fim)
+            return resposta
+        return _Requisicao(executar)
+
+    def get(self, fileId, fields=None, **kwargs):
+        return _Requisicao(lambda: self._metadados(self.arquivos[fileId]))
+
+    def get_media(self, fileId, **kwargs):
+        return _Requisicao(lambda: self.arquivos[fileId]['conteudo'])
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        def executar():
+            conteudo = media_body.getbytes(0, media_body.size()) if media_body is not None else b''
+            pai = (body.get('parents') or ['root'])[0]
+            file_id = self.adicionar(body['name'], pai, conteudo, body.get('mimeType', "application/octet-stream"), body.get('id'))
+            return {'id': file_id}
+        return _Requisicao(executar)
+
+    def update(self, fileId, addParents=None, removeParents=None, body=None, fields=None, **kwargs):
+        def executar():
+            with self._lock:
+                arq = self.arquivos[fileId]
+                if removeParents:
+                    arq['parents'] = [p for p in arq['parents'] if p not in removeParents.split(',')]
+                if addParents:
+                    arq['parents'] += addParents.split(',')
+                if body:
+                    arq.update({k: v for k, v in body.items() if k in ('name', 'trashed')})
+                arq['modifiedTime'] = _agora()
+                self._registrar(fileId)
+                return {'id': fileId, 'parents': list(arq['parents'])}
+        return _Requisicao(executar)
+
+    def generateIds(self, count=10, space='drive', **kwargs):
+        return _Requisicao(lambda: {'ids': [f"fake{next(self._ids)}" for _ in range(count)]})
+
+    # --- Permissões ---
+
+    def permissions(self):
+        return _Permissoes(self)
+
+    # --- Feed de mudanças ---
+
+    def changes(self):
+        return _Mudancas(self)
+
+    # --- Lote ---
+
+    def new_batch_http_request(self, callback=None):
+        return _Lote(callback)
+
+
+class _Permissoes:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def create(self, fileId, body, fields=None, **kwargs):
+        def executar():
+            if fileId not in self._drive.arquivos:
+                raise FileNotFoundError(fileId)
+            self._drive.permissoes.append((fileId, body))
+            return {'id': f"perm{len(self._drive.permissoes)}"}
+        return _Requisicao(executar)
+
+
+class _Mudancas:
+    def __init__(self, drive):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Requisicao(lambda: {'startPageToken': str(len(self._drive.mudancas))})
+
+    def list(self, pageToken, pageSize=100, fields=None, **kwargs):
+        def executar():
+            drive = self._drive
+            with drive._lock:
+                inicio = int(pageToken)
+                fim = min(inicio + (pageSize or 100), len(drive.mudancas))
+                mudancas = []
+                for mudanca in drive.mudancas[inicio:fim]:
+                    arq = drive.arquivos.get(mudanca['fileId'])
+                    if mudanca['removed'] or arq is None:
+                        mudancas.append({'fileId': mudanca['fileId'], 'removed': True})
+                    else:
+                        mudancas.append({'fileId': mudanca['fileId'], 'removed': False, 'file': drive._metadados(arq)})
+                resposta = {'changes': mudancas}
+                if fim < len(drive.mudancas):
+                    resposta['nextPageToken'] = str(fim)
+                else:
+                    resposta['newStartPageToken'] = str(fim)
+                return resposta
+        return _Requisicao(executar)
+
+
+class _Lote:
+    def __init__(self, callback):
+        self._callback = callback
+        self._requisicoes = []
+
+    def add(self, requisicao, request_id=None, callback=None):
+        self._requisicoes.append((request_id or str(len(self._requisicoes)), requisicao, callback or self._callback))
+
+    def execute(self, http=None):
+        for request_id, requisicao, callback in self._requisicoes:
+            try:
+                resposta, erro = requisicao.execute(), None
+            except Exception as e:
+                resposta, erro = None, e
+            if callback:
+                callback(request_id, resposta, erro)
+
+
+def semear_de_pasta(drive, raiz, destinos):
+    """Carrega arquivos locais no fake: destinos = {subpasta_local: pasta_id}."""
+    for subpasta, pasta_id in destinos.items():
+        caminho = os.path.join(raiz, subpasta)
+        if not os.path.isdir(caminho):
+            continue
+        for nome in sorted(os.listdir(caminho)):
+            arquivo = os.path.join(caminho, nome)
+            if os.path.isfile(arquivo):
+                with open(arquivo, 'rb') as f:
+                    drive.adicionar(nome, pasta_id, f.read())
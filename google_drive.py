@@ -1,141 +1,299 @@
 import os
 import json
-import datetime
-import re # IMPORTANTE: Adicionado para validação do nome do arquivo
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-
-# Carrega credenciais direto da variável de ambiente
-SERVICE_ACCOUNT_JSON = os.getenv("service_account.json")
-if not SERVICE_ACCOUNT_JSON:
-    raise Exception("Variável de ambiente 'service_account.json' não foi encontrada.")
-info = json.loads(SERVICE_ACCOUNT_JSON)
-
-creds = service_account.Credentials.from_service_account_info(
-    info,
-    scopes=["https://www.googleapis.com/auth/drive"]
-)
-
-drive_service = build('drive', 'v3', credentials=creds)
+import time
+import threading
+import mimetypes
+
+import cache_drive
+from metricas import contar, cronometrar
+
+# Implementação Google Drive do armazenamento (ver armazenamento.py): só este módulo fala com a API do Drive.
+
 FOLDER_ID = "18RIUiRS7SugpUeGOIAxu3gVj9D6-MD2G"
 FOLDER_ID_PLACAS = "1fLWrdK6MUhbeyBDvWHjz-2bTmZ2GB0ap" # Novo ID para a pasta das placas
 
+# DRIVE_FAKE=1 troca o Drive por um substituto em memória (fake_drive.py), para rodar sem rede/credenciais.
+# DRIVE_FAKE_DIR pode apontar uma pasta com "arquivos padronizados/" e "placas/" para semear o fake.
+DRIVE_FAKE = os.getenv("DRIVE_FAKE", "0") == "1"
+
+MIME_PASTA = "application/vnd.google-apps.folder"
+
+# Credenciais e serviço são criados no primeiro uso: importar o módulo não exige a variável de ambiente
+# nem carrega as bibliotecas do Google (importadas dentro das funções, para a API subir mais rápido).
+creds = None
+drive_service = None
+_servico_lock = threading.Lock()
+
+
+def obter_servico():
+    global creds, drive_service
+    with _servico_lock:
+        if drive_service is not None:
+            return drive_service
+
+        if DRIVE_FAKE:
+            from fake_drive import FakeDrive, semear_de_pasta
+            servico = FakeDrive()
+            semear_de_pasta(servico, os.getenv("DRIVE_FAKE_DIR", "."), {
+                "arquivos padronizados": servico.criar_pasta("arquivos padronizados", FOLDER_ID),
+                "placas": FOLDER_ID_PLACAS,
+            })
+        else:
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+
+            # Carrega credenciais direto da variável de ambiente
+            SERVICE_ACCOUNT_JSON = os.getenv("service_account.json")
+            if not SERVICE_ACCOUNT_JSON:
+                raise Exception("Variável de ambiente 'service_account.json' não foi encontrada.")
+            info = json.loads(SERVICE_ACCOUNT_JSON)
+
+            creds = service_account.Credentials.from_service_account_info(
+                info,
+                scopes=["https://www.googleapis.com/auth/drive"]
+            )
+            # Documento de descoberta empacotado no google-api-python-client: nenhuma requisição para montar o cliente
+            servico = build('drive', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+
+        drive_service = servico
+        return drive_service
+
+
+def executar(operacao, requisicao, http=None):
+    """Executa uma requisição da API contando e medindo a chamada (drive_chamadas_total, etapa drive_<operacao>)."""
+    contar("drive_chamadas_total", operacao=operacao)
+    with cronometrar(f"drive_{operacao}"):
+        return requisicao.execute(http=http)
+
+
+# --- ÍNDICE DE PASTAS (nome -> id/md5/modifiedTime) ---
+# Evita uma consulta (ou download) por arquivo: a pasta é listada uma vez e reaproveitada até o TTL vencer.
+INDICE_TTL_SEGUNDOS = float(os.getenv("DRIVE_INDICE_TTL", "300"))
+_ids_subpastas = {}
+_indices_pastas = {}  # folder_id -> (instante_da_listagem, {nome: metadados})
+_indices_lock = threading.Lock()
 
-def baixar_arquivo_drive(nome_arquivo, subpasta=None):
-    """Baixa e retorna caminho local de um arquivo no Drive"""
-    if subpasta:
-        sub_query = f"'{FOLDER_ID}' in parents and name='{subpasta}' and mimeType='application/vnd.google-apps.folder'"
-        sub_result = drive_service.files().list(q=sub_query, fields="files(id)").execute().get('files', [])
-        if not sub_result:
-            raise FileNotFoundError(f"Subpasta '{subpasta}' não encontrada no Drive.")
+# Espelho local das pastas (espelho_drive.py), mantido pelo feed de mudanças; None quando desligado
+_espelho = None
+
+
+def definir_espelho(espelho):
+    global _espelho
+    _espelho = espelho
+
+
+def obter_id_subpasta(subpasta, criar=False):
+    """Retorna o ID de uma subpasta da pasta principal (memorizado após a primeira consulta)."""
+    sub_id = _ids_subpastas.get(subpasta)
+    if sub_id:
+        return sub_id
+    sub_query = f"'{FOLDER_ID}' in parents and name='{subpasta}' and mimeType='{MIME_PASTA}'"
+    sub_result = executar("list", obter_servico().files().list(q=sub_query, fields="files(id)")).get('files', [])
+    if sub_result:
         sub_id = sub_result[0]['id']
-        query = f"'{sub_id}' in parents and name='{nome_arquivo}'"
+    elif criar:
+        meta = {'name': subpasta, 'mimeType': MIME_PASTA, 'parents': [FOLDER_ID]}
+        sub_id = executar("create", obter_servico().files().create(body=meta, fields='id')).get('id')
     else:
-        query = f"'{FOLDER_ID}' in parents and name='{nome_arquivo}'"
-
-    response = drive_service.files().list(q=query, fields="files(id,name)").execute()
-    arquivos = response.get('files', [])
-    if not arquivos:
-        raise FileNotFoundError(f"{nome_arquivo} não encontrado no Drive.")
-    file_id = arquivos[0]['id']
-    local_path = f"/tmp/{nome_arquivo}"
-    data = drive_service.files().get_media(fileId=file_id).execute()
-    with open(local_path, 'wb') as f:
-        f.write(data)
-    return local_path
-
-
-def listar_arquivos_existentes():
-    """Retorna lista de nomes de arquivos na pasta principal"""
-    response = drive_service.files().list(q=f"'{FOLDER_ID}' in parents", fields="files(name)").execute()
-    return [f['name'] for f in response.get('files', [])]
-
-
-def upload_to_drive(caminho, nome):
-    """Faz upload de arquivo e retorna URL pública"""
-    file_metadata = {'name': nome, 'parents': [FOLDER_ID]}
-    media = MediaFileUpload(caminho, mimetype="application/dxf")
-    file = drive_service.files().create(body=file_metadata, media_body=media, fields="id").execute()
-    drive_service.permissions().create(
-        fileId=file.get('id'), body={'role':'reader','type':'anyone'}
-    ).execute()
-    return f"https://drive.google.com/file/d/{file.get('id')}/view"
-
-
-def mover_arquivos_antigos():
+        raise FileNotFoundError(f"Subpasta '{subpasta}' não encontrada no Drive.")
+    _ids_subpastas[subpasta] = sub_id
+    return sub_id
+
+
+def listar_paginado(query, campos="id,name,md5Checksum,modifiedTime"):
+    """Executa uma consulta files.list percorrendo todas as páginas."""
+    arquivos = []
+    page_token = None
+    while True:
+        response = executar("list", obter_servico().files().list(
+            q=query,
+            fields=f"nextPageToken, files({campos})",
+            pageSize=1000,
+            pageToken=page_token,
+        ))
+        arquivos.extend(response.get('files', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return arquivos
+
+
+def listar_pasta_paginado(folder_id, campos="id,name,md5Checksum,modifiedTime"):
+    """Lista todos os arquivos (não excluídos) de uma pasta, percorrendo todas as páginas."""
+    return listar_paginado(f"'{folder_id}' in parents and trashed = false", campos)
+
+
+def listar_pasta(folder_id):
+    """Todos os arquivos da pasta (inclusive nomes repetidos), do espelho quando ele está ligado."""
+    if _espelho is not None and _espelho.espelha(folder_id):
+        return _espelho.arquivos(folder_id)
+    return listar_pasta_paginado(folder_id)
+
+
+def indice_pasta(folder_id, forcar=False):
     """
-    Move arquivos .dxf e .png com data diferente da atual para subpasta 'arquivo morto'.
-    Retorna quantidade movida.
+    Retorna o índice {nome: {'id', 'md5Checksum', 'modifiedTime'}} de uma pasta.
+    A listagem é refeita apenas quando o TTL vence ou quando forcar=True.
+    Com o espelho ligado, o índice vem dele (forcar=True só aplica as mudanças pendentes).
     """
-    hoje = datetime.datetime.now().strftime("%d-%m-%Y")
-    # garantir subpasta 'arquivo morto'
-    query = f"'{FOLDER_ID}' in parents and name='arquivo morto' and mimeType='application/vnd.google-apps.folder'"
-    res = drive_service.files().list(q=query, fields="files(id)").execute().get('files', [])
-    if res:
-        dest_id = res[0]['id']
-    else:
-        meta = {'name':'arquivo morto','mimeType':'application/vnd.google-apps.folder','parents':[FOLDER_ID]}
-        folder = drive_service.files().create(body=meta, fields='id').execute()
-        dest_id = folder.get('id')
-    # listar arquivos na pasta principal
-    resp = drive_service.files().list(q=f"'{FOLDER_ID}' in parents", fields="files(id,name,parents)").execute()
-    files = resp.get('files', [])
-    moved = 0
-    for f in files:
-        name = f.get('name', '')
-        if name.startswith('Plano de corte '):
-            # extrair data antes de extensão
-            parts = name.rsplit(' ', 1)
-            if len(parts)==2:
-                date_part = parts[1].replace('.dxf','').replace('.png','')
-                if date_part != hoje:
-                    drive_service.files().update(
-                        fileId=f['id'],
-                        addParents=dest_id,
-                        removeParents=FOLDER_ID,
-                        fields='id, parents'
-                    ).execute()
-                    moved += 1
-    return moved
-
-def arquivo_existe_drive(nome_arquivo, subpasta="arquivos padronizados"):
+    if _espelho is not None and _espelho.espelha(folder_id):
+        if forcar:
+            _espelho.sincronizar()
+        return _espelho.indice(folder_id)
+
+    with _indices_lock:
+        registro = _indices_pastas.get(folder_id)
+        if registro and not forcar and time.monotonic() - registro[0] < INDICE_TTL_SEGUNDOS:
+            return registro[1]
+
+    indice = {}
+    for arq in listar_pasta_paginado(folder_id):
+        # Nomes duplicados: mantém o primeiro, como a busca antiga (arquivos[0])
+        indice.setdefault(arq['name'], arq)
+
+    with _indices_lock:
+        _indices_pastas[folder_id] = (time.monotonic(), indice)
+    return indice
+
+
+def invalidar_indice(folder_id):
+    with _indices_lock:
+        _indices_pastas.pop(folder_id, None)
+
+
+LIMITE_PREFIXOS_CONSULTA = 20  # prefixos por consulta "name contains ... or ..." (mantém a query num tamanho seguro)
+
+
+def _escapar_query(texto):
+    return texto.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def listar_com_prefixos(folder_id, prefixos):
     """
-    Verifica se um arquivo existe no Google Drive tentando baixar.
-    Retorna True se existe, False se não.
+    Arquivos da pasta cujo nome começa (sem diferenciar maiúsculas) com algum dos prefixos, com poucas
+    consultas ('name contains' combinados com OR, paginadas) ou direto do espelho.
     """
-    try:
-        baixar_arquivo_drive(nome_arquivo, subpasta=subpasta)
-        return True
-    except FileNotFoundError:
-        return False
-    except Exception:
-        return False
+    prefixos = list(dict.fromkeys(prefixos))
+    if _espelho is not None and _espelho.espelha(folder_id):
+        arquivos = _espelho.arquivos(folder_id)
+    else:
+        arquivos = []
+        for inicio in range(0, len(prefixos), LIMITE_PREFIXOS_CONSULTA):
+            lote = prefixos[inicio:inicio + LIMITE_PREFIXOS_CONSULTA]
+            filtro = " or ".join(f"name contains '{_escapar_query(prefixo)}'" for prefixo in lote)
+            arquivos.extend(listar_paginado(f"'{folder_id}' in parents and trashed = false and ({filtro})"))
+    minusculos = tuple(prefixo.lower() for prefixo in prefixos)
+    return [arq for arq in arquivos if arq['name'].lower().startswith(minusculos)]
 
 
-# --- NOVA FUNÇÃO DE PLACAS ---
-def buscar_dxf_personalizado(target_id: str):
+def baixar_arquivo_por_id(file_id, nome_arquivo, md5=None, http=None):
     """
-    Busca o DXF na pasta específica de placas e garante a nomenclatura correta usando Regex.
+    Retorna o caminho local de um arquivo do Drive, passando pelo cache em disco.
+    Sem md5 informado, a versão é revalidada por uma consulta de metadados (sem baixar o conteúdo).
     """
-    # 1. Pré-filtro no Google Drive para ser super rápido
-    query = f"'{FOLDER_ID_PLACAS}' in parents and name contains '{target_id}' and trashed = false"
-    response = drive_service.files().list(q=query, fields="files(id,name)").execute()
-    arquivos = response.get('files', [])
-
-    # 2. Regex rigoroso: ID + (espaços) + hífen + (espaços) + 'Arquivo Personalizado' + (tudo liberado) + '.dxf'
-    # O re.IGNORECASE garante que não importa maiúsculas ou minúsculas
-    padrao = re.compile(rf"^{re.escape(target_id)}\s*-\s*arquivo personalizado.*\.dxf$", re.IGNORECASE)
-
-    for arq in arquivos:
-        if padrao.match(arq['name']):
-            # Encontrou o arquivo que bate 100% com as regras de nome! Fazemos o download.
-            file_id = arq['id']
-            local_path = f"/tmp/{arq['name']}"
-            data = drive_service.files().get_media(fileId=file_id).execute()
-            with open(local_path, 'wb') as f:
-                f.write(data)
-            return local_path, arq['name']
-    
-    # Se rodou tudo e não achou ou não bateu o Regex
-    return None, None
\ No newline at end of file
+    if not md5:
+        md5 = executar("get", obter_servico().files().get(fileId=file_id, fields="md5Checksum"), http=http).get('md5Checksum')
+    extensao = os.path.splitext(nome_arquivo)[1] or ".dxf"
+    local_path = cache_drive.obter_do_cache(file_id, md5, extensao)
+    if local_path:
+        return local_path
+
+    data = executar("get_media", obter_servico().files().get_media(fileId=file_id), http=http)
+    if not md5:
+        # Arquivos sem md5 (ex.: nativos do Google) não podem ser endereçados por conteúdo
+        local_path = f"/tmp/{nome_arquivo}"
+        with open(local_path, 'wb') as f:
+            f.write(data)
+        return local_path
+    return cache_drive.salvar_no_cache(file_id, md5, data, extensao)
+
+
+# --- UPLOADS E DOWNLOADS CONCORRENTES ---
+# O cliente httplib2 não é thread-safe: cada thread usa a própria conexão autenticada.
+LIMITE_LOTE_DRIVE = 100  # máximo de chamadas por requisição em lote da API do Drive
+
+_http_local = threading.local()
+
+
+def _http_da_thread():
+    obter_servico()
+    if creds is None:
+        return None
+    http = getattr(_http_local, 'http', None)
+    if http is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(creds, http=httplib2.Http())
+        _http_local.http = http
+    return http
+
+
+def url_publica(file_id):
+    return f"https://drive.google.com/file/d/{file_id}/view"
+
+
+def reservar_ids(quantidade):
+    """Reserva IDs de arquivo no Drive (files.generateIds) para criar os arquivos depois com URL já conhecida."""
+    ids = []
+    while len(ids) < quantidade:
+        lote = min(quantidade - len(ids), 1000)
+        ids.extend(executar("generateIds", obter_servico().files().generateIds(count=lote, space='drive'))['ids'])
+    return ids
+
+
+def criar_arquivo(caminho, nome, pasta_id, file_id=None):
+    """Envia o arquivo local para a pasta (com o ID reservado, se houver) e retorna o ID criado."""
+    from googleapiclient.http import MediaFileUpload
+    file_metadata = {'name': nome, 'parents': [pasta_id]}
+    if file_id:
+        file_metadata['id'] = file_id
+    mimetype = "application/dxf" if nome.lower().endswith('.dxf') else (mimetypes.guess_type(nome)[0] or "application/octet-stream")
+    media = MediaFileUpload(caminho, mimetype=mimetype)
+    file = executar("create", obter_servico().files().create(body=file_metadata, media_body=media, fields="id"), http=_http_da_thread())
+    return file.get('id')
+
+
+def _executar_em_lotes(operacao, file_ids, requisicao):
+    """Executa requisicao(file_id) para todos os IDs em requisições em lote. Retorna [(file_id, exceção)] das falhas."""
+    servico = obter_servico()
+    erros = []
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            erros.append((request_id, exception))
+
+    for inicio in range(0, len(file_ids), LIMITE_LOTE_DRIVE):
+        batch = servico.new_batch_http_request(callback=_callback)
+        for file_id in file_ids[inicio:inicio + LIMITE_LOTE_DRIVE]:
+            batch.add(requisicao(servico, file_id), request_id=file_id)
+        contar("drive_chamadas_total", len(file_ids[inicio:inicio + LIMITE_LOTE_DRIVE]), operacao=operacao)
+        executar("batch", batch, http=_http_da_thread())
+    return erros
+
+
+def publicar_arquivos(file_ids):
+    """Concede leitura para 'anyone' a vários arquivos usando requisições em lote (até 100 por lote)."""
+    erros = _executar_em_lotes(
+        "permissions.create",
+        file_ids,
+        lambda servico, file_id: servico.permissions().create(fileId=file_id, body={'role':'reader','type':'anyone'}, fields='id'),
+    )
+    if erros:
+        raise Exception(f"Falha ao publicar {len(erros)} arquivo(s) no Drive: {erros[0][1]}")
+    return [url_publica(file_id) for file_id in file_ids]
+
+
+def mover_em_lote(file_ids, destino_id, origem_id):
+    """Move os arquivos de origem_id para destino_id em requisições em lote. Retorna [(file_id, exceção)] das falhas."""
+    erros = _executar_em_lotes(
+        "update",
+        file_ids,
+        lambda servico, file_id: servico.files().update(
+            fileId=file_id,
+            addParents=destino_id,
+            removeParents=origem_id,
+            fields='id, parents'
+        ),
+    )
+    invalidar_indice(origem_id)
+    invalidar_indice(destino_id)
+    return erros
@@ -0,0 +1,187 @@
+import os
+import time
+import fcntl
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# Jobs executados em segundo plano dentro do próprio processo da API
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_TTL_SEGUNDOS = float(os.getenv("JOBS_TTL_SEGUNDOS", "3600"))  # por quanto tempo um job finalizado fica consultável
+# Travas (flock) dos agendamentos exclusivos: com vários workers do uvicorn, só um processo cria os jobs
+AGENDADOS_DIR = os.getenv("AGENDADOS_DIR", "/tmp/agendados")
+
+PENDENTE, EXECUTANDO, CONCLUIDO, ERRO, CANCELADO = "pendente", "executando", "concluido", "erro", "cancelado"
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_parar_agendados = threading.Event()
+
+
+class JobCancelado(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, tipo):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.status = PENDENTE
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.finalizado_em = None
+        self.etapa = None
+        self.planos = []
+        self.resultado = None
+        self.erro = None
+        self.future = None
+        self._cancelar = threading.Event()
+        self._lock = threading.Lock()
+
+    def notificar(self, evento):
+        """Callback de progresso do pipeline. Também é o ponto onde um pedido de cancelamento interrompe o job."""
+        if self._cancelar.is_set():
+            raise JobCancelado()
+        with self._lock:
+            if evento.get("tipo") == "plano":
+                self.planos.append({k: v for k, v in evento.items() if k != "tipo"})
+            else:
+                self.etapa = {k: v for k, v in evento.items() if k != "tipo"}
+
+    def cancelar(self):
+        self._cancelar.set()
+        if self.future is not None and self.future.cancel():
+            self._finalizar(CANCELADO)
+
+    def _finalizar(self, status, resultado=None, erro=None):
+        with self._lock:
+            self.status = status
+            self.resultado = resultado
+            self.erro = erro
+            self.finalizado_em = time.time()
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "tipo": self.tipo,
+                "status": self.status,
+                "criado_em": self.criado_em,
+                "iniciado_em": self.iniciado_em,
+                "finalizado_em": self.finalizado_em,
+                "etapa": self.etapa,
+                "planos": list(self.planos),
+                "resultado": self.resultado,
+                "erro": self.erro,
+            }
+
+
+def _obter_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="job")
+        return _executor
+
+
+def _executar(job, funcao, args):
+    if job._cancelar.is_set():
+        job._finalizar(CANCELADO)
+        return
+    job.status = EXECUTANDO
+    job.iniciado_em = time.time()
+    try:
+        resultado = funcao(*args, progresso=job.notificar)
+        job._finalizar(CONCLUIDO, resultado=resultado)
+    except JobCancelado:
+        job._finalizar(CANCELADO)
+    except HTTPException as e:
+        job._finalizar(ERRO, erro={"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        job._finalizar(ERRO, erro={"status_code": 500, "detail": str(e)})
+
+
+def _remover_expirados():
+    agora = time.time()
+    with _jobs_lock:
+        for job_id in [j.id for j in _jobs.values() if j.finalizado_em and agora - j.finalizado_em > JOBS_TTL_SEGUNDOS]:
+            del _jobs[job_id]
+
+
+def criar_job(tipo, funcao, *args):
+    """Registra e agenda funcao(*args, progresso=job.notificar). Retorna o Job imediatamente."""
+    _remover_expirados()
+    job = Job(tipo)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    job.future = _obter_executor().submit(_executar, job, funcao, args)
+    return job
+
+
+def obter_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def cancelar_job(job_id):
+    job = obter_job(job_id)
+    if job is not None and job.status in (PENDENTE, EXECUTANDO):
+        job.cancelar()
+    return job
+
+
+def _assumir_agendamento(tipo):
+    """
+    Tenta ficar com o agendamento de tipo entre os processos que usam o mesmo AGENDADOS_DIR (flock sem esperar).
+    Devolve o arquivo travado, que fica aberto enquanto este processo for o dono, ou None se outro processo já for.
+    """
+    os.makedirs(AGENDADOS_DIR, exist_ok=True)
+    f = open(os.path.join(AGENDADOS_DIR, f"{tipo}.lock"), "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def agendar_periodico(tipo, funcao, intervalo_segundos, *args, exclusivo=False):
+    """
+    Cria um job de funcao(*args) a cada intervalo_segundos, enquanto a API estiver no ar.
+    Com exclusivo=True só um processo cria os jobs; se ele sair, outro assume no próximo intervalo.
+    """
+    def _laco():
+        trava = None
+        try:
+            while not _parar_agendados.wait(intervalo_segundos):
+                if exclusivo and trava is None:
+                    trava = _assumir_agendamento(tipo)
+                    if trava is None:
+                        continue  # outro processo cuida deste agendamento
+                try:
+                    job = criar_job(tipo, funcao, *args)
+                    print(f"[AGENDADO] Job '{tipo}' criado: {job.id}")
+                except Exception as e:
+                    print(f"[AGENDADO] Falha ao criar o job '{tipo}': {e}")
+        finally:
+            if trava is not None:
+                trava.close()
+
+    _parar_agendados.clear()
+    thread = threading.Thread(target=_laco, name=f"agendado-{tipo}", daemon=True)
+    thread.start()
+    return thread
+
+
+def encerrar_jobs():
+    global _executor
+    _parar_agendados.set()
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+        executor, _executor = _executor, None
+    for job in jobs:
+        job._cancelar.set()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
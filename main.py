@@ -1,23 +1,43 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware 
 
 # Importações das funções de composição DXF e de interação com o Google Drive
-from compose_dxf import compor_dxf_com_base as compor_dxf_com_base_18
-from compose_dxf_32 import compor_dxf_com_base_32
-from compose_dxf_32_2 import compor_dxf_com_base_32_2
+from compose_dxf import compor_plano
+from perfis_maquinas import obter_perfil, perfil_customizado
+from biblioteca_blocos import BibliotecaBlocos
+from preview import agendar_preview, encerrar_previews, MODOS_PREVIEW, PREVIEW_ADIADO, PREVIEW_SINCRONO
 
 # Importações para a rota de Placas Personalizadas
-from detects_plaque import processar_ids_placas, limpar_dxf_placas, mapear_cor, preparar_placas_pedido, extrair_placas_de_arquivo_local
+from detects_plaque import processar_ids_placas, limpar_dxf_placas_cores, mapear_cor, preparar_placas_pedido, extrair_placas_de_arquivo_local
 
-from google_drive import upload_to_drive, listar_arquivos_existentes, baixar_arquivo_drive, arquivo_existe_drive, mover_arquivos_antigos, buscar_dxf_personalizado
+from pool_planos import agendar_planos, encerrar_pool
+from jobs import criar_job, obter_job, cancelar_job, encerrar_jobs, agendar_periodico
+from streaming import transmitir
+from miniaturas import obter_miniatura, url_miniatura
+from espelho_drive import DRIVE_ESPELHO, iniciar_espelho_em_segundo_plano, estado_espelho, parar_espelho
+from alocador_nomes import reservar_nomes
+from metricas import cronometrar, iniciar_medicoes, encerrar_medicoes, server_timing, observar_histograma, contar, exportar
+from perfilador import perfilado, iniciar_captura, encerrar_captura, token_valido, admin_habilitado, listar_perfis, caminho_perfil, relatorio
+
+from armazenamento import ARMAZENAMENTO, PASTA_PADRONIZADOS, resolver_dxfs_personalizados, buscar, enviar_em_segundo_plano, publicar_arquivos, reservar_ids, url_publica, baixar_varios, arquivos_faltando, mover_arquivos_antigos
 
 from datetime import datetime
+from functools import partial
+from collections import defaultdict
 from types import SimpleNamespace
+from concurrent.futures import wait, FIRST_COMPLETED
 import os
 import math
+import time
 
 app = FastAPI()
+INICIADO_EM = time.monotonic()
+
+# Arquivamento automático dos planos de dias anteriores (0 desliga; a rota /mover-antigos continua disponível)
+ARQUIVAR_INTERVALO_HORAS = float(os.getenv("ARQUIVAR_INTERVALO_HORAS", "0"))
 
 # --- Configuração CORS ---
 origins = ["*"]
@@ -28,14 +48,59 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Perfil", "X-Perfil-Id"],
 )
 
+@app.middleware("http")
+async def medir_requisicao(request: Request, call_next):
+    """Mede cada requisição (http_requisicao_segundos) e devolve as etapas medidas no cabeçalho Server-Timing."""
+    medicoes, token = iniciar_medicoes()
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+        rota = getattr(request.scope.get("route"), "path", "desconhecida")
+        observar_histograma("http_requisicao_segundos", time.perf_counter() - inicio, rota=rota)
+        contar("http_requisicoes_total", rota=rota, status=response.status_code)
+        if medicoes:
+            response.headers["Server-Timing"] = server_timing(medicoes)
+        return response
+    finally:
+        encerrar_medicoes(token)
+
+@app.middleware("http")
+async def perfilar_requisicao(request: Request, call_next):
+    """
+    Com "X-Perfil: 1" (ou ?perfil=1) a requisição roda sob o profiler, respeitando o limite de taxa do perfilador;
+    a resposta traz X-Perfil-Id (consultar em /admin/perfis/{id}) ou "X-Perfil: limitado" quando não houve captura.
+    """
+    pedido = request.headers.get("x-perfil") == "1" or request.query_params.get("perfil") == "1"
+    if not pedido or not token_valido(request.headers.get("x-perfil-token")):
+        return await call_next(request)
+    iniciada = iniciar_captura(request.url.path)
+    if iniciada is None:
+        response = await call_next(request)
+        response.headers["X-Perfil"] = "limitado"
+        return response
+
+    captura, token = iniciada
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Perfil-Id"] = captura.id
+        return response
+    finally:
+        encerrar_captura(token)
+        await run_in_threadpool(captura.salvar, status, time.perf_counter() - inicio)
+
 class Entrada(BaseModel):
     arquivos: list[str]
     nome_arquivo: str = None
     maquina: str = "18"
     coordenadas_customizadas: dict[int, list[float]] = None
     tamanho_chapa: list[float] = None
+    preview: str = PREVIEW_ADIADO  # "sincrono", "adiado" ou "nenhum"
 
 class PlacaConfig(BaseModel):
     id: str
@@ -49,73 +114,162 @@ class EntradaPlacas(BaseModel):
     tamanho_chapa: list[float] = None
     coordenadas_customizadas: dict[int, list[float]] = None
     nome_arquivo: str = None
+    preview: str = PREVIEW_ADIADO
 
 class AnalisePlacasEntrada(BaseModel):
     ids: list[str]
+    incluir_svg: bool = False  # True devolve os SVGs em base64 na resposta, como antes
+
+@app.on_event("startup")
+def iniciar_workers():
+    if DRIVE_ESPELHO and ARMAZENAMENTO == "drive":
+        iniciar_espelho_em_segundo_plano()
+    if ARQUIVAR_INTERVALO_HORAS > 0:
+        # Um arquivador só, mesmo com vários workers do uvicorn (todos moveriam os mesmos arquivos)
+        agendar_periodico("mover_antigos", mover_arquivos_antigos, ARQUIVAR_INTERVALO_HORAS * 3600, exclusivo=True)
+
+@app.on_event("shutdown")
+def encerrar_workers():
+    parar_espelho()
+    encerrar_jobs()
+    encerrar_pool()
+    encerrar_previews()
+
+def notificar(progresso, **evento):
+    """Repassa um evento de progresso ao job (ou stream) que acompanha a requisição, se houver."""
+    if progresso is not None:
+        progresso(evento)
+
+def montar_e_enviar_planos(nomes_arquivos, perfil, biblioteca, nome_base, progresso=None, preview=PREVIEW_ADIADO):
+    """
+    Divide a lista em planos, escolhe os nomes livres, monta os planos no pool de processos
+    e envia os DXFs ao Drive, devolvendo os resultados na ordem dos planos.
+    O PNG de preview é gerado junto (sincrono), depois da entrega do DXF (adiado) ou não é gerado (nenhum).
+    """
+    if preview not in MODOS_PREVIEW:
+        raise HTTPException(status_code=400, detail=f"Modo de preview inválido: use {', '.join(MODOS_PREVIEW)}.")
+
+    max_por_plano = perfil.max_por_plano
+    num_planos = (len(nomes_arquivos) + max_por_plano - 1) // max_por_plano
+
+    chunks = [nomes_arquivos[i*max_por_plano : (i+1)*max_por_plano] for i in range(num_planos)]
+    with cronometrar("reservar_nomes"):
+        nomes_saida = reservar_nomes(nome_base, num_planos)
+
+    # No modo adiado os IDs dos PNGs são reservados agora, para a URL sair junto com o DXF
+    ids_png = reservar_ids(num_planos) if preview == PREVIEW_ADIADO else []
+
+    notificar(progresso, tipo="etapa", etapa="composicao", total_planos=num_planos, concluidos=0)
+    compor_fn = partial(compor_plano, perfil, biblioteca=biblioteca, gerar_png=(preview == PREVIEW_SINCRONO))
+    futuros_planos = agendar_planos(compor_fn, chunks, [f"/tmp/{nome}" for nome in nomes_saida])
+
+    # Cada plano montado já sobe para o Drive (DXF e PNG em paralelo) enquanto os próximos são montados.
+    # Os planos cujos uploads terminaram são publicados juntos, em lote, sempre na ordem dos planos.
+    envios = []  # (nome, [futures com os IDs a publicar], url_png já conhecida ou None)
+    planos = []
+
+    def publicar_prontos():
+        lote = []
+        for nome, futures, url_png in envios[len(planos):]:
+            if not all(f.done() for f in futures):
+                break
+            lote.append((nome, [f.result() for f in futures], url_png))
+        if not lote:
+            return
+        with cronometrar("publicar"):
+            urls = iter(publicar_arquivos([file_id for _, ids, _ in lote for file_id in ids]))
+        for nome, ids, url_png in lote:
+            url_dxf = next(urls)
+            plano = {"nome": nome, "url": url_dxf, "url_png": next(urls) if len(ids) > 1 else url_png}
+            notificar(progresso, tipo="plano", indice=len(planos), **plano)
+            planos.append(plano)
+            notificar(progresso, tipo="etapa", etapa="upload", total_planos=num_planos, enviados=len(planos))
+
+    try:
+        while len(planos) < num_planos:
+            aguardando = [f for f in futuros_planos[len(envios):] if not f.done()]
+            aguardando += [f for _, futures, _ in envios[len(planos):] for f in futures if not f.done()]
+            if aguardando:
+                wait(aguardando, return_when=FIRST_COMPLETED)
+
+            while len(envios) < num_planos and futuros_planos[len(envios)].done():
+                i = len(envios)
+                path_saida, png_path = futuros_planos[i].result()
+                futures = [enviar_em_segundo_plano(path_saida, nomes_saida[i])]
+                url_png = None
+                if png_path:
+                    futures.append(enviar_em_segundo_plano(png_path, os.path.basename(png_path)))
+                elif preview == PREVIEW_ADIADO:
+                    chunk_objs = [SimpleNamespace(nome=name, posicao=index + 1) for index, name in enumerate(chunks[i])]
+                    agendar_preview(perfil, path_saida, chunk_objs, ids_png[i], biblioteca)
+                    url_png = url_publica(ids_png[i])
+                envios.append((nomes_saida[i], futures, url_png))
+                notificar(progresso, tipo="etapa", etapa="composicao", total_planos=num_planos, concluidos=len(envios))
+
+            publicar_prontos()
+    finally:
+        for future in futuros_planos:
+            future.cancel()
+    return planos
+
+@app.get("/health")
+def health():
+    """Verificação de saúde: responde sem consultar o Drive (nem criar o cliente dele)."""
+    return {
+        "status": "ok",
+        "armazenamento": ARMAZENAMENTO,
+        "espelho": estado_espelho(),
+        "no_ar_segundos": round(time.monotonic() - INICIADO_EM, 1),
+    }
 
 # ==========================================
 # ROTAS ANTIGAS MANTIDAS
 # ==========================================
 @app.post("/compor")
 def compor(entrada: Entrada):
+    return executar_compor(entrada)
+
+@perfilado
+def executar_compor(entrada: Entrada, progresso=None):
     total = len(entrada.arquivos)
     if total == 0:
         raise HTTPException(status_code=400, detail="Nenhum arquivo fornecido.")
 
     entrada.arquivos.sort(key=lambda x: x.lower())
-    arquivos_faltando = []
-    for nome in entrada.arquivos:
-        if not arquivo_existe_drive(nome, subpasta="arquivos padronizados"):
-            arquivos_faltando.append(nome)
-    if arquivos_faltando:
-        raise HTTPException(status_code=404, detail=f"Arquivos não encontrados no Google Drive:\n" + "\n".join(arquivos_faltando))
-
-    existentes = listar_arquivos_existentes()
+    notificar(progresso, tipo="etapa", etapa="validacao", total_arquivos=total)
+    try:
+        with cronometrar("validacao"):
+            faltando = arquivos_faltando(entrada.arquivos, pasta=PASTA_PADRONIZADOS)
+    except FileNotFoundError:
+        faltando = list(entrada.arquivos)
+    if faltando:
+        raise HTTPException(status_code=404, detail=f"Arquivos não encontrados no Google Drive:\n" + "\n".join(faltando))
+
+    # Pré-carrega as peças no cache em disco (compartilhado com os workers dos planos)
+    unicos = sorted(set(entrada.arquivos))
+    notificar(progresso, tipo="etapa", etapa="download", total_arquivos=len(unicos), concluidos=0)
+    caminhos_pecas = {}
+    with cronometrar("download_pecas"):
+        for concluidos, (nome, caminho) in enumerate(baixar_varios(unicos, pasta=PASTA_PADRONIZADOS), 1):
+            caminhos_pecas[nome] = caminho
+            notificar(progresso, tipo="etapa", etapa="download", total_arquivos=len(unicos), concluidos=concluidos)
+    # Uma biblioteca de peças para todos os planos da requisição
+    biblioteca = BibliotecaBlocos(caminhos_pecas)
+
     nome_base = entrada.nome_arquivo
     is_custom = entrada.coordenadas_customizadas is not None and entrada.tamanho_chapa is not None
 
     if is_custom:
-        max_por_plano = len(entrada.coordenadas_customizadas)
-        def compor_fn(objs, path_saida):
-            compor_dxf_com_base_18(objs, path_saida, custom_coords=entrada.coordenadas_customizadas, custom_chapa=entrada.tamanho_chapa)
+        perfil = perfil_customizado(entrada.coordenadas_customizadas, entrada.tamanho_chapa)
     else:
-        if entrada.maquina == "32":
-            max_por_plano = 32
-            compor_fn = compor_dxf_com_base_32
-        elif entrada.maquina == "32-2":
-            max_por_plano = 32
-            compor_fn = compor_dxf_com_base_32_2
-        else:
-            max_por_plano = 18
-            compor_fn = compor_dxf_com_base_18
-
-    planos = []
-    num_planos = (total + max_por_plano - 1) // max_por_plano
-
-    for i in range(num_planos):
-        chunk_names = entrada.arquivos[i*max_por_plano : (i+1)*max_por_plano]
-        chunk_objs = [SimpleNamespace(nome=name, posicao=index + 1) for index, name in enumerate(chunk_names)]
-
-        nome_saida = nome_base if i == 0 else nome_base.replace('.dxf', f'_{i+1:02d}.dxf')
-        nome_saida_livre = nome_saida
-        contador_extra = 2
-        while nome_saida_livre in existentes:
-            nome_saida_livre = nome_base.replace('.dxf', f'_{i+contador_extra:02d}.dxf')
-            contador_extra += 1
-
-        path_saida = f"/tmp/{nome_saida_livre}"
-        compor_fn(chunk_objs, path_saida)
-        url_dxf = upload_to_drive(path_saida, nome_saida_livre)
-        url_png_simulado = url_dxf.replace('.dxf', '.png').replace('/view', '')
-        planos.append({"nome": nome_saida_livre, "url": url_dxf, "url_png": url_png_simulado})
-
+        perfil = obter_perfil(entrada.maquina)
+    planos = montar_e_enviar_planos(entrada.arquivos, perfil, biblioteca, nome_base, progresso, entrada.preview)
     return {"plans": planos}
 
 @app.post("/mover-antigos")
 def mover_antigos():
     try:
-        moved_count = mover_arquivos_antigos()
-        return {"moved": moved_count}
+        return mover_arquivos_antigos()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao mover arquivos: {e}")
 
@@ -124,26 +278,50 @@ def mover_antigos():
 # ==========================================
 
 @app.post("/analisar_placas")
+@perfilado
 def analisar_placas(entrada: AnalisePlacasEntrada):
     if not entrada.ids:
         raise HTTPException(status_code=400, detail="Nenhum ID fornecido para análise.")
     
-    resultados = preparar_placas_pedido(entrada.ids)
+    resultados = preparar_placas_pedido(entrada.ids, entrada.incluir_svg)
+    for resultado in resultados:
+        adicionar_miniaturas(resultado)
     return {"resultados": resultados}
 
 @app.post("/upload_analisar_placa")
-async def upload_analisar_placa(file: UploadFile = File(...), target_id: str = Form(...)):
+async def upload_analisar_placa(file: UploadFile = File(...), target_id: str = Form(...), incluir_svg: bool = Form(False)):
     """ Endpoint para upload manual de DXF caso não ache no Drive. """
     caminho_temp = f"/tmp/{target_id}_uploaded.dxf"
     
     with open(caminho_temp, "wb") as buffer:
         buffer.write(await file.read())
         
-    resultado = extrair_placas_de_arquivo_local(caminho_temp, target_id)
+    # Extração fora do event loop: não trava as outras requisições e, numa captura de perfil,
+    # o @perfilado mede só esta requisição (na thread dela), sem o trabalho intercalado no loop
+    resultado = await run_in_threadpool(extrair_placas_de_arquivo_local, caminho_temp, target_id, incluir_svg)
+    return adicionar_miniaturas(resultado)
+
+def adicionar_miniaturas(resultado):
+    """Inclui em cada placa a URL da miniatura SVG (desenhada só quando for pedida)."""
+    for placa in resultado.get("placas", []):
+        placa["miniatura"] = url_miniatura(resultado["id"], placa["index"])
     return resultado
 
+@app.get("/placas/{target_id}/{index}.svg")
+def miniatura_placa(target_id: str, index: int):
+    svg = obter_miniatura(target_id, index)
+    if svg is None:
+        raise HTTPException(status_code=404, detail="Placa não encontrada. Analise o arquivo antes de pedir a miniatura.")
+    if not svg:
+        raise HTTPException(status_code=500, detail="Não foi possível desenhar a miniatura da placa.")
+    return Response(content=svg, media_type="image/svg+xml")
+
 @app.post("/engraved_plaque")
 def engraved_plaque(entrada: EntradaPlacas):
+    return executar_engraved_plaque(entrada)
+
+@perfilado
+def executar_engraved_plaque(entrada: EntradaPlacas, progresso=None):
     if entrada.ids and not entrada.placas:
         resultados = processar_ids_placas(entrada.ids)
         return {"resultados": resultados}
@@ -156,6 +334,24 @@ def engraved_plaque(entrada: EntradaPlacas):
 
     lista_arquivos_composicao = []
     resultados_log = []
+    notificar(progresso, tipo="etapa", etapa="download", total_placas=len(entrada.placas))
+
+    # Fallback: as placas sem arquivos específicos são agrupadas por arquivo do Drive;
+    # cada arquivo é baixado e limpo uma vez e as cores saem desse mesmo resultado (memorizado por versão).
+    cores_por_id = defaultdict(list)
+    for placa in entrada.placas:
+        if not placa.arquivos_especificos:
+            cores_por_id[placa.id].append(mapear_cor(placa.cor))
+    with cronometrar("resolver_placas"):
+        arquivos_drive = resolver_dxfs_personalizados(list(cores_por_id)) if cores_por_id else {}
+    limpezas = {}
+    with cronometrar("limpeza_placas"):
+        for target_id, cores in cores_por_id.items():
+            arq = arquivos_drive[target_id]
+            if arq is None:
+                continue
+            baixar = partial(buscar, arq)
+            limpezas[target_id] = limpar_dxf_placas_cores(baixar, (arq['id'], arq.get('modifiedTime')), target_id, cores)
 
     for placa in entrada.placas:
         # Se o Frontend já nos enviou os DXFs exatos e limpos do /tmp/ (Pós Análise)
@@ -171,16 +367,13 @@ def engraved_plaque(entrada: EntradaPlacas):
             resultados_log.append({"id": placa.id, "status": "sucesso", "placas_usadas": qtd_selecionada})
         else:
             # Fallback Original
-            caminho_local, nome_original = buscar_dxf_personalizado(placa.id)
-            if not caminho_local:
+            if placa.id not in limpezas:
                 resultados_log.append({"id": placa.id, "status": "nao_encontrado"})
                 continue
                 
             sufixo_cor = mapear_cor(placa.cor)
-            nome_limpo = f"{placa.id}_limpo-{sufixo_cor}.dxf"
-            caminho_limpo = f"/tmp/{nome_limpo}"
-            
-            qtd_encontrada = limpar_dxf_placas(caminho_local, caminho_limpo)
+            qtd_encontrada, nomes_limpos = limpezas[placa.id]
+            nome_limpo = nomes_limpos.get(sufixo_cor)
             resultados_log.append({"id": placa.id, "placas_internas_encontradas": qtd_encontrada, "cor_injetada": sufixo_cor})
             
             if qtd_encontrada > 0:
@@ -191,30 +384,98 @@ def engraved_plaque(entrada: EntradaPlacas):
     if not lista_arquivos_composicao:
         raise HTTPException(status_code=400, detail="Nenhuma placa válida encontrada para compor.")
 
-    total = len(lista_arquivos_composicao)
-    max_por_plano = len(entrada.coordenadas_customizadas)
-    num_planos = (total + max_por_plano - 1) // max_por_plano
-    
-    existentes = listar_arquivos_existentes()
-    nome_base = entrada.nome_arquivo
-    planos = []
+    perfil = perfil_customizado(entrada.coordenadas_customizadas, entrada.tamanho_chapa)
+    biblioteca = BibliotecaBlocos({nome: f"/tmp/{nome}" for nome in set(lista_arquivos_composicao)})
+    planos = montar_e_enviar_planos(lista_arquivos_composicao, perfil, biblioteca, entrada.nome_arquivo, progresso, entrada.preview)
+
+    return {"logs_deteccao": resultados_log, "plans": planos}
+
+# ==========================================
+# STREAMING DE PROGRESSO (NDJSON / SSE)
+# ==========================================
+
+@app.post("/compor/stream")
+def compor_stream(entrada: Entrada, formato: str = "ndjson"):
+    return transmitir(executar_compor, entrada, formato)
+
+@app.post("/engraved_plaque/stream")
+def engraved_plaque_stream(entrada: EntradaPlacas, formato: str = "ndjson"):
+    return transmitir(executar_engraved_plaque, entrada, formato)
 
-    for i in range(num_planos):
-        chunk_names = lista_arquivos_composicao[i*max_por_plano : (i+1)*max_por_plano]
-        chunk_objs = [SimpleNamespace(nome=name, posicao=index + 1) for index, name in enumerate(chunk_names)]
+# ==========================================
+# JOBS ASSÍNCRONOS (pedidos grandes)
+# ==========================================
 
-        nome_saida = nome_base if i == 0 else nome_base.replace('.dxf', f'_{i+1:02d}.dxf')
-        nome_saida_livre = nome_saida
-        contador_extra = 2
-        while nome_saida_livre in existentes:
-            nome_saida_livre = nome_base.replace('.dxf', f'_{i+contador_extra:02d}.dxf')
-            contador_extra += 1
+@app.post("/jobs/compor", status_code=202)
+def criar_job_compor(entrada: Entrada):
+    job = criar_job("compor", executar_compor, entrada)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/jobs/engraved_plaque", status_code=202)
+def criar_job_engraved_plaque(entrada: EntradaPlacas):
+    job = criar_job("engraved_plaque", executar_engraved_plaque, entrada)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/jobs/mover-antigos", status_code=202)
+def criar_job_mover_antigos():
+    job = criar_job("mover_antigos", mover_arquivos_antigos)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def consultar_job(job_id: str):
+    job = obter_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job.como_dict()
+
+@app.delete("/jobs/{job_id}")
+def cancelar(job_id: str):
+    job = cancelar_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job.como_dict()
+# ==========================================
+# MÉTRICAS
+# ==========================================
 
-        path_saida = f"/tmp/{nome_saida_livre}"
-        compor_dxf_com_base_18(chunk_objs, path_saida, custom_coords=entrada.coordenadas_customizadas, custom_chapa=entrada.tamanho_chapa)
+@app.get("/metrics")
+def metrics():
+    """Métricas deste processo no formato texto do Prometheus (cada worker do uvicorn tem as suas)."""
+    return Response(exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-        url_dxf = upload_to_drive(path_saida, nome_saida_livre)
-        url_png_simulado = url_dxf.replace('.dxf', '.png').replace('/view', '')
-        planos.append({"nome": nome_saida_livre, "url": url_dxf, "url_png": url_png_simulado})
+# ==========================================
+# PERFIS (cProfile) DE REQUISIÇÕES
+# ==========================================
 
-    return {"logs_deteccao": resultados_log, "plans": planos}
\ No newline at end of file
+def verificar_token_perfil(token):
+    if not admin_habilitado():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_valido(token):
+        raise HTTPException(status_code=403, detail="Token de perfil inválido.")
+
+@app.get("/admin/perfis")
+def perfis(x_perfil_token: str = Header(None)):
+    verificar_token_perfil(x_perfil_token)
+    return {"perfis": listar_perfis()}
+
+@app.get("/admin/perfis/{perfil_id}")
+def perfil(perfil_id: str, formato: str = "texto", ordenar: str = "cumulative", limite: int = 60, x_perfil_token: str = Header(None)):
+    """
+    Resumo em texto do perfil (formato=texto) ou o arquivo .prof para abrir no snakeviz/pstats (formato=prof).
+    Só o trabalho síncrono das funções @perfilado (threads da requisição e workers) entra no perfil; o event loop não é perfilado.
+    """
+    verificar_token_perfil(x_perfil_token)
+    caminho = caminho_perfil(perfil_id)
+    if caminho is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    if formato == "prof":
+        return FileResponse(caminho, media_type="application/octet-stream", filename=f"{perfil_id}.prof")
+    if formato != "texto":
+        raise HTTPException(status_code=400, detail="Formato inválido: use texto ou prof.")
+    try:
+        texto = relatorio(perfil_id, ordenar, limite)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Ordenação inválida: {ordenar}.")
+    if texto is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+    return Response(texto, media_type="text/plain; charset=utf-8")
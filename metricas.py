@@ -0,0 +1,201 @@
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Future
+
+from perfilador import para_worker
+
+# Métricas do processo da API no formato texto do Prometheus (/metrics): histogramas de duração por
+# etapa do pipeline e contadores (ex.: chamadas ao Drive). As etapas medidas durante uma requisição
+# também vão para o cabeçalho Server-Timing da resposta.
+# Etapas medidas nos workers do pool de processos voltam junto com o resultado (submeter_medindo).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+ETAPAS = "planos_etapa_segundos"
+
+_DESCRICOES = {
+    ETAPAS: ("histogram", "Duração de cada etapa do pipeline, em segundos."),
+    "http_requisicao_segundos": ("histogram", "Duração das requisições HTTP por rota, em segundos."),
+    "http_requisicoes_total": ("counter", "Requisições HTTP atendidas, por rota e status."),
+    "drive_chamadas_total": ("counter", "Chamadas à API do Google Drive, por operação."),
+}
+
+_histogramas = {}  # (nome, rótulos) -> [contagens por bucket..., soma, total]
+_contadores = {}   # (nome, rótulos) -> valor
+_lock = threading.Lock()
+
+# Medições da requisição atual: lista de (etapa, segundos), ou None fora de uma requisição
+_medicoes = ContextVar("medicoes", default=None)
+# Dentro de executar_medindo as medições só são coletadas: quem agendou registra ao receber o resultado
+_coletando_worker = ContextVar("coletando_worker", default=None)
+
+
+def _rotulos(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observar_histograma(nome, segundos, **labels):
+    chave = (nome, _rotulos(labels))
+    with _lock:
+        valores = _histogramas.get(chave)
+        if valores is None:
+            valores = _histogramas[chave] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                valores[i] += 1
+        valores[-2] += segundos
+        valores[-1] += 1
+
+
+def contar(nome, valor=1, **labels):
+    chave = (nome, _rotulos(labels))
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def observar(etapa, segundos):
+    """Registra a duração de uma etapa no histograma e nas medições da requisição."""
+    coleta = _coletando_worker.get()
+    if coleta is not None:
+        coleta.append((etapa, segundos))
+        return
+    observar_histograma(ETAPAS, segundos, etapa=etapa)
+    medicoes = _medicoes.get()
+    if medicoes is not None:
+        medicoes.append((etapa, segundos))
+
+
+@contextmanager
+def cronometrar(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+
+def cronometrado(etapa):
+    """Decorador: mede cada chamada da função como a etapa indicada."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def embrulho(*args, **kwargs):
+            with cronometrar(etapa):
+                return funcao(*args, **kwargs)
+        return embrulho
+    return decorador
+
+
+# --- REQUISIÇÕES E WORKERS ---
+
+def iniciar_medicoes():
+    """Começa a coletar as medições do contexto atual. Retorna (lista, token para encerrar_medicoes)."""
+    medicoes = []
+    return medicoes, _medicoes.set(medicoes)
+
+
+def encerrar_medicoes(token):
+    _medicoes.reset(token)
+
+
+def executar_medindo(funcao, *args, **kwargs):
+    """Roda no worker: executa a função e devolve (resultado, medições feitas durante ela)."""
+    medicoes = []
+    token = _coletando_worker.set(medicoes)
+    try:
+        return funcao(*args, **kwargs), medicoes
+    finally:
+        _coletando_worker.reset(token)
+
+
+class _FuturoMedido(Future):
+    def __init__(self, interno):
+        super().__init__()
+        self._interno = interno
+
+    def cancel(self):
+        return self._interno.cancel()
+
+
+def submeter_medindo(executor, funcao, *args):
+    """
+    executor.submit(funcao, *args) para pools de processos: as etapas medidas no worker são registradas
+    neste processo quando o resultado chega (e entram no Server-Timing da requisição que agendou).
+    O Future devolvido resolve para o resultado da função, como o de submit.
+    Durante uma captura de perfil (perfilador.py), o worker também perfila a própria execução.
+    """
+    destino = _medicoes.get()
+    externo = _FuturoMedido(executor.submit(executar_medindo, para_worker(funcao), *args))
+
+    def _concluir(interno):
+        if interno.cancelled():
+            Future.cancel(externo)
+            return
+        try:
+            resultado, medicoes = interno.result()
+        except BaseException as e:
+            externo.set_exception(e)
+            return
+        for etapa, segundos in medicoes:
+            observar_histograma(ETAPAS, segundos, etapa=etapa)
+            if destino is not None:
+                destino.append((etapa, segundos))
+        externo.set_result(resultado)
+
+    externo._interno.add_done_callback(_concluir)
+    return externo
+
+
+def server_timing(medicoes):
+    """Valor do cabeçalho Server-Timing: uma entrada por etapa, com a soma das durações (ms) e quantas vezes ocorreu."""
+    totais = {}
+    for etapa, segundos in medicoes:
+        soma, vezes = totais.get(etapa, (0.0, 0))
+        totais[etapa] = (soma + segundos, vezes + 1)
+    return ", ".join(f'{etapa};dur={soma * 1000:.1f};desc="{vezes}x"' for etapa, (soma, vezes) in totais.items())
+
+
+# --- EXPOSIÇÃO ---
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(rotulos, extra=()):
+    itens = list(rotulos) + list(extra)
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in itens) + "}"
+
+
+def exportar():
+    """Todas as métricas no formato de exposição texto do Prometheus."""
+    with _lock:
+        histogramas = {chave: list(valores) for chave, valores in _histogramas.items()}
+        contadores = dict(_contadores)
+
+    linhas = []
+    nomes = sorted({nome for nome, _ in histogramas} | {nome for nome, _ in contadores})
+    for nome in nomes:
+        tipo, descricao = _DESCRICOES.get(nome, ("histogram" if any(n == nome for n, _ in histogramas) else "counter", nome))
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        for (n, rotulos), valores in sorted(histogramas.items()):
+            if n != nome:
+                continue
+            for limite, quantidade in zip(BUCKETS, valores):
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', f'{limite:g}')])} {quantidade}")
+            linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, [('le', '+Inf')])} {valores[-1]}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {valores[-2]:.6f}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {valores[-1]}")
+        for (n, rotulos), valor in sorted(contadores.items()):
+            if n == nome:
+                linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor:g}")
+    return "\n".join(linhas) + "\n"
+
+
+def limpar_metricas():
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
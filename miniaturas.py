@@ -0,0 +1,61 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import ezdxf
+
+from cache_pecas import chave_versao
+from detects_plaque import caminho_placa, gerar_svg
+
+# Miniaturas SVG das placas analisadas: desenhadas na thread da requisição só quando pedidas
+# e guardadas em memória pela versão do DXF da placa (reanalisar o arquivo gera outra entrada).
+MINIATURAS_CACHE_MAX = int(os.getenv("MINIATURAS_CACHE_MAX", "512"))
+
+_svgs = OrderedDict()
+_pendentes = {}
+_lock = threading.Lock()
+
+
+def renderizar_svg(caminho):
+    """Lê o DXF da placa e devolve o SVG."""
+    return gerar_svg(ezdxf.readfile(caminho))
+
+
+def url_miniatura(target_id, index):
+    return f"/placas/{target_id}/{index}.svg"
+
+
+def obter_miniatura(target_id, index):
+    """SVG da placa, desenhado no primeiro pedido; None se a placa não existir (arquivo ainda não analisado)."""
+    caminho = caminho_placa(target_id, index)
+    if not os.path.exists(caminho):
+        return None
+    chave = chave_versao(caminho)
+
+    with _lock:
+        if chave in _svgs:
+            _svgs.move_to_end(chave)
+            return _svgs[chave]
+        # Pedidos simultâneos da mesma placa esperam o mesmo desenho
+        future = _pendentes.get(chave)
+        desenhar = future is None
+        if desenhar:
+            future = _pendentes[chave] = Future()
+
+    if desenhar:
+        try:
+            future.set_result(renderizar_svg(caminho))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with _lock:
+                _pendentes.pop(chave, None)
+    svg = future.result()
+
+    if svg:
+        with _lock:
+            _svgs[chave] = svg
+            _svgs.move_to_end(chave)
+            while len(_svgs) > MINIATURAS_CACHE_MAX:
+                _svgs.popitem(last=False)
+    return svg
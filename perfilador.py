@@ -0,0 +1,221 @@
+import io
+import os
+import hmac
+import json
+import time
+import uuid
+import glob
+import pstats
+import cProfile
+import threading
+import functools
+from contextvars import ContextVar
+
+# Perfil (cProfile) de requisições isoladas, pedido pelo cabeçalho "X-Perfil: 1" ou por ?perfil=1.
+# No máximo uma captura a cada PERFIL_INTERVALO_SEGUNDOS (0 desliga); os pedidos fora do intervalo
+# rodam normalmente, sem perfil. Cada captura vira <id>.prof (formato pstats, abre no snakeviz) e
+# <id>.json (rota, status, duração) em PERFIL_DIR; só as últimas PERFIL_MAX são mantidas.
+PERFIL_DIR = os.getenv("PERFIL_DIR", "/tmp/perfis")
+PERFIL_INTERVALO_SEGUNDOS = float(os.getenv("PERFIL_INTERVALO_SEGUNDOS", "60"))
+PERFIL_MAX = int(os.getenv("PERFIL_MAX", "20"))
+# Com PERFIL_TOKEN definido, pedir um perfil e usar as rotas /admin/perfis exige "X-Perfil-Token: <token>";
+# sem ele as rotas /admin/perfis ficam desligadas (os perfis só podem ser lidos direto de PERFIL_DIR)
+PERFIL_TOKEN = os.getenv("PERFIL_TOKEN", "")
+
+_ultima_captura = None  # time.monotonic() da última captura iniciada
+_limite_lock = threading.Lock()
+
+# Captura da requisição atual (ou None); as funções com @perfilado rodam sob o profiler quando há uma
+_captura = ContextVar("captura_perfil", default=None)
+# Evita ligar um segundo profiler na mesma thread (funções perfiladas chamando outras)
+_thread = threading.local()
+
+
+class Captura:
+    def __init__(self, rota):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.rota = rota
+        self.criado_em = time.time()
+        self._perfis = []
+        self._lock = threading.Lock()
+
+    def adicionar(self, perfil):
+        with self._lock:
+            self._perfis.append(perfil)
+
+    def caminho_worker(self):
+        """Arquivo onde um worker (outra thread ou processo) grava o perfil da sua parte do trabalho."""
+        return os.path.join(PERFIL_DIR, f"{self.id}.worker-{uuid.uuid4().hex[:8]}.prof")
+
+    def salvar(self, status, duracao):
+        """Junta o perfil da requisição com os dos workers e grava <id>.prof e <id>.json. Retorna os metadados."""
+        os.makedirs(PERFIL_DIR, exist_ok=True)
+        with self._lock:
+            perfis = list(self._perfis)
+        parciais = sorted(glob.glob(os.path.join(PERFIL_DIR, f"{self.id}.worker-*.prof")))
+        meta = {
+            "id": self.id,
+            "rota": self.rota,
+            "status": status,
+            "duracao_ms": round(duracao * 1000, 1),
+            "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.criado_em)),
+            "partes": len(perfis) + len(parciais),
+        }
+        fontes = perfis + parciais
+        if fontes:
+            stats = pstats.Stats(fontes[0])
+            for fonte in fontes[1:]:
+                stats.add(fonte)
+            stats.dump_stats(os.path.join(PERFIL_DIR, f"{self.id}.prof"))
+        for caminho in parciais:
+            os.remove(caminho)
+        with open(os.path.join(PERFIL_DIR, f"{self.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        _podar()
+        return meta
+
+
+def token_valido(token):
+    return not PERFIL_TOKEN or hmac.compare_digest(token or "", PERFIL_TOKEN)
+
+
+def admin_habilitado():
+    """As rotas /admin/perfis expõem caminhos internos e tempos: só existem com PERFIL_TOKEN definido."""
+    return bool(PERFIL_TOKEN)
+
+
+def _reservar_vaga():
+    """Limite de taxa: libera no máximo uma captura por PERFIL_INTERVALO_SEGUNDOS."""
+    global _ultima_captura
+    if PERFIL_INTERVALO_SEGUNDOS <= 0:
+        return False
+    with _limite_lock:
+        agora = time.monotonic()
+        if _ultima_captura is not None and agora - _ultima_captura < PERFIL_INTERVALO_SEGUNDOS:
+            return False
+        _ultima_captura = agora
+        return True
+
+
+def iniciar_captura(rota):
+    """Começa a capturar o perfil do contexto atual. Retorna (captura, token) ou None se o limite de taxa não permitir."""
+    if not _reservar_vaga():
+        return None
+    captura = Captura(rota)
+    return captura, _captura.set(captura)
+
+
+def encerrar_captura(token):
+    _captura.reset(token)
+
+
+def _ligar_profiler():
+    """Liga um cProfile nesta thread. None se já houver um ativo (a partir do Python 3.12 o profiler vale para o processo todo)."""
+    if getattr(_thread, "ativo", False):
+        return None
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        return None
+    _thread.ativo = True
+    return perfil
+
+
+def _desligar_profiler(perfil):
+    perfil.disable()
+    _thread.ativo = False
+
+
+def perfilado(funcao):
+    """Decorador: durante uma captura, executa a função sob o cProfile e junta o resultado à captura."""
+    @functools.wraps(funcao)
+    def embrulho(*args, **kwargs):
+        captura = _captura.get()
+        perfil = _ligar_profiler() if captura is not None else None
+        if perfil is None:
+            return funcao(*args, **kwargs)
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _desligar_profiler(perfil)
+            captura.adicionar(perfil)
+    return embrulho
+
+
+def _executar_perfilado(caminho, funcao, *args, **kwargs):
+    """Roda no worker: executa a função sob o cProfile e grava o perfil em caminho."""
+    perfil = _ligar_profiler()
+    if perfil is None:
+        return funcao(*args, **kwargs)
+    try:
+        return funcao(*args, **kwargs)
+    finally:
+        _desligar_profiler(perfil)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        perfil.dump_stats(caminho)
+
+
+def para_worker(funcao):
+    """
+    Versão de funcao para enviar a um pool (de threads ou processos): durante uma captura, o worker
+    perfila a própria execução e o perfil entra no da requisição. Fora de captura, devolve funcao.
+    """
+    captura = _captura.get()
+    if captura is None:
+        return funcao
+    return functools.partial(_executar_perfilado, captura.caminho_worker(), funcao)
+
+
+# --- CONSULTA ---
+
+def _ler_meta(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def listar_perfis():
+    """Metadados das capturas guardadas, da mais recente para a mais antiga."""
+    metas = [_ler_meta(c) for c in glob.glob(os.path.join(PERFIL_DIR, "*.json"))]
+    return sorted((m for m in metas if m), key=lambda m: m["id"], reverse=True)
+
+
+def caminho_perfil(perfil_id):
+    """Caminho do .prof de uma captura, ou None se ela não existir."""
+    if os.path.basename(perfil_id) != perfil_id:
+        return None
+    caminho = os.path.join(PERFIL_DIR, f"{perfil_id}.prof")
+    return caminho if os.path.exists(caminho) else None
+
+
+def relatorio(perfil_id, ordenar="cumulative", limite=60):
+    """Resumo em texto (pstats) das funções mais custosas da captura, ou None se ela não existir."""
+    caminho = caminho_perfil(perfil_id)
+    if caminho is None:
+        return None
+    saida = io.StringIO()
+    stats = pstats.Stats(caminho, stream=saida)
+    stats.strip_dirs().sort_stats(ordenar).print_stats(limite)
+    return saida.getvalue()
+
+
+PARCIAL_VALIDADE_SEGUNDOS = 3600  # perfis de workers sem captura salva são apagados depois disso
+
+
+def _podar():
+    """Mantém só as PERFIL_MAX capturas mais recentes (e remove perfis de workers que chegaram tarde)."""
+    manter = {m["id"] for m in listar_perfis()[:PERFIL_MAX]}
+    limite_parciais = time.time() - PARCIAL_VALIDADE_SEGUNDOS
+    for caminho in glob.glob(os.path.join(PERFIL_DIR, "*")):
+        nome = os.path.basename(caminho)
+        if nome.split(".", 1)[0] in manter:
+            continue
+        if ".worker-" in nome and os.path.getmtime(caminho) > limite_parciais:
+            continue  # pode ser de uma captura ainda em andamento
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
@@ -0,0 +1,90 @@
+import os
+import json
+import ezdxf
+from ezdxf import units
+
+# Registro das máquinas (tamanho da chapa, posições das etiquetas, marcas de base e escala do preview).
+# Carregado uma única vez na importação; adicionar uma máquina é só incluir uma entrada no JSON.
+ARQUIVO_PERFIS = os.getenv(
+    "PERFIS_MAQUINAS_ARQUIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfis_maquinas.json"),
+)
+
+
+class PerfilMaquina:
+    def __init__(self, nome, tamanho_chapa, coordenadas, marcas_base, tamanho_marca, etiqueta, preview):
+        self.nome = nome
+        self.tamanho_chapa = tuple(tamanho_chapa)
+        self.coordenadas = {int(pos): tuple(xy) for pos, xy in coordenadas.items()}
+        self.marcas_base = [tuple(xy) for xy in marcas_base]
+        self.tamanho_marca = tamanho_marca
+        self.etiqueta = tuple(etiqueta)
+        self.preview = dict(preview)
+        # Template do plano: os quadrados das marcas de base já calculados uma vez por perfil.
+        # (Montar um ezdxf.new() e adicionar as polylines prontas sai mais barato que copiar um documento-modelo.)
+        h = tamanho_marca / 2
+        self.template_marcas = [
+            [(x - h, y - h), (x + h, y - h), (x + h, y + h), (x - h, y + h), (x - h, y - h)]
+            for x, y in self.marcas_base
+        ]
+
+    @property
+    def max_por_plano(self):
+        return len(self.coordenadas)
+
+    def novo_documento(self):
+        """Cria o documento de um plano a partir do template do perfil (unidades em mm + marcas de base)."""
+        doc = ezdxf.new()
+        doc.header['$INSUNITS'] = units.MM
+        msp = doc.modelspace()
+        for pontos in self.template_marcas:
+            msp.add_lwpolyline(pontos, dxfattribs={'color': 2, 'closed': True})
+        return doc, msp
+
+
+def _marcas_da_chapa(tamanho_chapa, margem):
+    largura, altura = tamanho_chapa
+    return [(margem, margem), (largura - margem, margem), (margem, altura - margem), (largura - margem, altura - margem)]
+
+
+def carregar_perfis(caminho=ARQUIVO_PERFIS):
+    with open(caminho, encoding="utf-8") as f:
+        config = json.load(f)
+    perfis = {}
+    for nome, dados in config["perfis"].items():
+        perfis[nome] = PerfilMaquina(
+            nome=nome,
+            tamanho_chapa=dados["tamanho_chapa"],
+            coordenadas=dados["coordenadas"],
+            marcas_base=dados.get("marcas_base") or _marcas_da_chapa(dados["tamanho_chapa"], config["margem_marca"]),
+            tamanho_marca=dados.get("tamanho_marca", config["tamanho_marca"]),
+            etiqueta=dados.get("etiqueta", config["etiqueta"]),
+            preview=dados["preview"],
+        )
+    return config, perfis
+
+
+CONFIG_PERFIS, PERFIS = carregar_perfis()
+PERFIL_PADRAO = CONFIG_PERFIS["padrao"]
+
+
+def obter_perfil(maquina):
+    """Perfil registrado da máquina; nomes desconhecidos caem no perfil padrão, como antes."""
+    return PERFIS.get(maquina) or PERFIS[PERFIL_PADRAO]
+
+
+def perfil_customizado(coordenadas=None, tamanho_chapa=None, base=None):
+    """
+    Perfil montado na hora para o Motor Universal. O que não for informado vem do perfil base;
+    com tamanho_chapa informado, as marcas de base ficam a margem_marca mm de cada borda.
+    """
+    base = base or PERFIS[PERFIL_PADRAO]
+    return PerfilMaquina(
+        nome="custom",
+        tamanho_chapa=tamanho_chapa or base.tamanho_chapa,
+        coordenadas=coordenadas or base.coordenadas,
+        marcas_base=_marcas_da_chapa(tamanho_chapa, CONFIG_PERFIS["margem_marca"]) if tamanho_chapa else base.marcas_base,
+        tamanho_marca=base.tamanho_marca,
+        etiqueta=base.etiqueta,
+        preview=base.preview,
+    )
@@ -0,0 +1,60 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+
+from metricas import submeter_medindo
+
+# Quantidade de processos usados para montar planos em paralelo (1 = tudo no processo da requisição)
+PLANOS_WORKERS = int(os.getenv("PLANOS_WORKERS", str(os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obter_pool():
+    """Cria sob demanda o pool de processos. Os workers vivem entre requisições e mantêm seus caches de peças."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' para que cada worker crie o próprio cliente do Drive em vez de herdar conexões abertas
+            _pool = ProcessPoolExecutor(max_workers=PLANOS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def encerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def gerar_plano(compor_fn, chunk_names, path_saida):
+    """
+    Monta um plano (executa no worker) e retorna (caminho_dxf, caminho_png).
+    compor_fn precisa ser serializável: função de módulo ou functools.partial.
+    O PNG não é enviado aqui; o processo da requisição envia DXF e PNG juntos.
+    """
+    chunk_objs = [SimpleNamespace(nome=name, posicao=index + 1) for index, name in enumerate(chunk_names)]
+    png_path = compor_fn(chunk_objs, path_saida, enviar_png=False)
+    return path_saida, png_path
+
+
+def agendar_planos(compor_fn, chunks, caminhos):
+    """
+    Agenda a montagem de todos os planos e retorna os Futures na ordem dos chunks;
+    cada um resolve para o par (dxf, png). Com PLANOS_WORKERS <= 1 os planos são
+    montados um a um numa thread só desta requisição (o upload dos prontos segue em paralelo).
+    As etapas medidas no worker entram nas métricas deste processo (submeter_medindo).
+    """
+    if PLANOS_WORKERS > 1:
+        executor = obter_pool()
+        return [submeter_medindo(executor, gerar_plano, compor_fn, chunk, caminho) for chunk, caminho in zip(chunks, caminhos)]
+    # Sem fila compartilhada: uma requisição nunca espera os planos de outra
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plano")
+    try:
+        return [submeter_medindo(executor, gerar_plano, compor_fn, chunk, caminho) for chunk, caminho in zip(chunks, caminhos)]
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,184 @@
+import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import cronometrado
+
+# Preview PNG dos planos: etapa separada da montagem do DXF, que pode ser síncrona, adiada ou desligada.
+# O Pillow só é importado no primeiro preview (a API sobe sem carregá-lo).
+PREVIEW_SINCRONO, PREVIEW_ADIADO, PREVIEW_NENHUM = "sincrono", "adiado", "nenhum"
+MODOS_PREVIEW = (PREVIEW_SINCRONO, PREVIEW_ADIADO, PREVIEW_NENHUM)
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+
+COLOR_MAP = {'DOU': '#FFD700', 'ROS': '#B76E79', 'PRA': '#C0C0C0'}
+LETTER_MAP = {'DOU': 'D', 'ROS': 'R', 'PRA': 'P'}
+
+# Tamanhos de fonte configuráveis
+TITLE_SIZE = 48  # ajuste tamanho do título aqui
+LETTER_SIZE = 72  # ajuste tamanho das letras aqui
+
+# Tentativas de caminhos de fontes TrueType
+FONT_PATHS = [
+    './DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/freefont/FreeSans.ttf',
+]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def obter_fontes():
+    """Fontes do título e das letras, carregadas uma única vez por processo."""
+    from PIL import ImageFont
+    for fp in FONT_PATHS:
+        if os.path.exists(fp):
+            try:
+                title_font = ImageFont.truetype(fp, TITLE_SIZE)
+                letter_font = ImageFont.truetype(fp, LETTER_SIZE)
+                print(f"[INFO] Fonte carregada de: {fp}")
+                return title_font, letter_font
+            except Exception:
+                continue
+    print(f"[WARN] Nenhuma fonte TrueType encontrada, usando padrão.")
+    return ImageFont.load_default(), ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def _draw_medidas():
+    from PIL import Image, ImageDraw
+    return ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+@lru_cache(maxsize=64)
+def tamanho_letra(letra):
+    """Largura e altura (px) de uma letra do preview; são poucas letras, medidas uma vez."""
+    bbox = _draw_medidas().textbbox((0, 0), letra, font=obter_fontes()[1])
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+def cor_e_letra(nome):
+    name = nome.upper()
+    # 1. Primeiro tenta as três últimas letras antes do .dxf
+    key = os.path.splitext(name)[0][-3:]
+    color = COLOR_MAP.get(key)
+    letter = LETTER_MAP.get(key)
+
+    # 2. Se não achou, procura -DOU, -ROS, -PRA em qualquer parte do nome
+    if color is None or letter is None:
+        if '-DOU' in name:
+            key = 'DOU'
+        elif '-ROS' in name:
+            key = 'ROS'
+        elif '-PRA' in name:
+            key = 'PRA'
+        else:
+            key = None
+
+        color = COLOR_MAP.get(key, '#CCCCCC')
+        letter = LETTER_MAP.get(key, '?')
+    return color, letter
+
+
+def _sprite_da_peca(biblioteca, nome, escala):
+    from sprites_pecas import obter_sprite
+    try:
+        return obter_sprite(biblioteca.caminho(nome), escala)
+    except Exception as e:
+        print(f"[WARN] Sem geometria para o preview de {nome}: {e}")
+        return None
+
+
+@cronometrado("preview_png")
+def renderizar_preview(perfil, caminho_dxf, lista_arquivos, biblioteca=None):
+    """
+    Desenha e salva o PNG de um plano (sem enviar). Retorna o caminho do PNG.
+    Com a biblioteca de peças, cada posição recebe o sprite com a geometria real da peça
+    sobre a cor do material; sem ela (ou se a peça não puder ser desenhada), só a cor e a letra.
+    """
+    from PIL import Image, ImageDraw
+    png_path = caminho_dxf.replace('.dxf', '.png')
+
+    plano_lx, plano_ly = perfil.tamanho_chapa
+    coords_reais = perfil.coordenadas
+    etiq_lx, etiq_ly = perfil.etiqueta
+
+    # Escala mm->px baseada na largura de preview do perfil
+    scale = perfil.preview["largura_px"] / plano_lx
+    w_px = int(round(plano_lx * scale))
+    h_px = int(round(plano_ly * scale))
+    margin = perfil.preview["margem_px"]
+    img = Image.new('RGB', (w_px, h_px + margin), 'white')
+    draw = ImageDraw.Draw(img)
+    title_font, letter_font = obter_fontes()
+
+    # Desenhar título centralizado
+    title = os.path.basename(caminho_dxf)
+    bbox = draw.textbbox((0, 0), title, font=title_font)
+    tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    draw.text(((w_px - tw) / 2, (margin - th) / 2), title, fill='black', font=title_font)
+
+    # Dimensões da etiqueta em px
+    half_w = (etiq_lx / 2) * scale
+    half_h = (etiq_ly / 2) * scale
+
+    # Desenhar retângulos e letras
+    for item in lista_arquivos:
+        color, letter = cor_e_letra(item.nome)
+
+        xm, ym = coords_reais.get(item.posicao, (0, 0))
+        cx = xm * scale
+        cy = h_px - (ym * scale) + margin
+
+        draw.rectangle([cx - half_w, cy - half_h, cx + half_w, cy + half_h], fill=color)
+
+        sprite = _sprite_da_peca(biblioteca, item.nome, scale) if biblioteca is not None else None
+        if sprite is not None:
+            sprite.colar(img, cx, cy)
+            continue
+
+        lw, lh = tamanho_letra(letter)
+        draw.text((cx - lw / 2, cy - lh / 2), letter, fill='black', font=letter_font)
+
+    os.makedirs(os.path.dirname(caminho_dxf) or '.', exist_ok=True)
+    img.save(png_path)
+    print(f"[INFO] PNG salvo: {png_path}")
+    return png_path
+
+
+def _obter_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="preview")
+        return _executor
+
+
+def _renderizar_e_enviar(perfil, caminho_dxf, lista_arquivos, file_id, biblioteca):
+    from armazenamento import enviar_em_segundo_plano, publicar_arquivos
+    try:
+        png_path = renderizar_preview(perfil, caminho_dxf, lista_arquivos, biblioteca)
+        enviar_em_segundo_plano(png_path, os.path.basename(png_path), file_id=file_id).result()
+        publicar_arquivos([file_id])
+        print(f"[INFO] PNG enviado ao Drive em segundo plano: {png_path}")
+    except Exception as e:
+        print(f"[ERROR] Falha ao gerar/enviar PNG em segundo plano: {e}")
+
+
+def agendar_preview(perfil, caminho_dxf, lista_arquivos, file_id, biblioteca=None):
+    """
+    Renderiza e envia o PNG depois que o DXF já foi entregue. O arquivo é criado no Drive
+    com um ID reservado antes (files.generateIds), então a URL do PNG já pode ser devolvida.
+    """
+    return _obter_executor().submit(_renderizar_e_enviar, perfil, caminho_dxf, lista_arquivos, file_id, biblioteca)
+
+
+def encerrar_previews():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+from ezdxf.addons.drawing import RenderContext, Frontend
+from ezdxf.addons.drawing.backend import Backend
+from ezdxf.addons.drawing.config import Configuration, ColorPolicy, BackgroundPolicy
+
+from cache_pecas import obter_peca, chave_versao
+from detects_plaque import desenho_lock
+
+# Sprites (imagens RGBA) das peças para o preview dos planos: cada peça é rasterizada uma vez por
+# versão do arquivo e escala; o PNG do plano só cola os sprites nas posições.
+SPRITES_CACHE_MAX = int(os.getenv("SPRITES_CACHE_MAX", "256"))
+
+_sprites = OrderedDict()
+_lock = threading.Lock()
+
+_CONFIG_SPRITE = Configuration(color_policy=ColorPolicy.BLACK, background_policy=BackgroundPolicy.OFF)
+
+
+class BackendPrimitivas(Backend):
+    """Backend do addon de desenho do ezdxf que só coleta as primitivas (em mm) para rasterizar depois com o Pillow."""
+
+    def __init__(self):
+        super().__init__()
+        self.linhas = []     # listas de pontos (polylines abertas)
+        self.poligonos = []  # listas de pontos (áreas preenchidas)
+        self.pontos = []
+
+    def set_background(self, color):
+        pass
+
+    def draw_point(self, pos, properties):
+        self.pontos.append((pos.x, pos.y))
+
+    def draw_line(self, start, end, properties):
+        self.linhas.append([(start.x, start.y), (end.x, end.y)])
+
+    def draw_solid_lines(self, lines, properties):
+        for s, e in lines:
+            self.draw_line(s, e, properties)
+
+    def draw_path(self, path, properties):
+        if len(path):
+            self.linhas.append([(v.x, v.y) for v in path.flattening(distance=self.config.max_flattening_distance)])
+
+    def draw_filled_polygon(self, points, properties):
+        self.poligonos.append([(v.x, v.y) for v in points.vertices()])
+
+    def draw_image(self, image_data, properties):
+        pass
+
+    def clear(self):
+        self.linhas, self.poligonos, self.pontos = [], [], []
+
+    def limites(self):
+        xs, ys = [], []
+        for pts in self.linhas + self.poligonos + [self.pontos]:
+            for x, y in pts:
+                xs.append(x)
+                ys.append(y)
+        if not xs:
+            return None
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+class Sprite:
+    """Imagem da peça e o deslocamento (px) do canto superior esquerdo em relação à origem da peça."""
+    __slots__ = ("imagem", "dx", "dy")
+
+    def __init__(self, imagem, dx, dy):
+        self.imagem = imagem
+        self.dx = dx
+        self.dy = dy
+
+    def colar(self, img, cx, cy):
+        """Cola o sprite com a origem da peça no pixel (cx, cy) da imagem do plano."""
+        img.paste(self.imagem, (int(round(cx + self.dx)), int(round(cy + self.dy))), self.imagem)
+
+
+def rasterizar_peca(caminho, escala, cor=(0, 0, 0, 255)):
+    """Desenha a geometria da peça (lida pelo cache de peças) em uma imagem RGBA transparente."""
+    peca = obter_peca(caminho)
+    backend = BackendPrimitivas()
+    # Uma peça por vez no frontend (desenho_lock); só a rasterização no Pillow é paralela
+    with desenho_lock:
+        Frontend(RenderContext(peca.doc), backend, config=_CONFIG_SPRITE).draw_entities(peca.entidades)
+    limites = backend.limites()
+    if limites is None:
+        return None
+
+    min_x, min_y, max_x, max_y = limites
+    borda = 1
+    largura = int(round((max_x - min_x) * escala)) + 2 * borda + 1
+    altura = int(round((max_y - min_y) * escala)) + 2 * borda + 1
+
+    def px(x, y):
+        return (x - min_x) * escala + borda, (max_y - y) * escala + borda
+
+    imagem = Image.new('RGBA', (largura, altura), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(imagem)
+    for pts in backend.poligonos:
+        if len(pts) >= 3:
+            draw.polygon([px(x, y) for x, y in pts], fill=cor)
+    for pts in backend.linhas:
+        if len(pts) >= 2:
+            draw.line([px(x, y) for x, y in pts], fill=cor, width=1)
+    for x, y in backend.pontos:
+        draw.point(px(x, y), fill=cor)
+
+    return Sprite(imagem, dx=min_x * escala - borda, dy=-max_y * escala - borda)
+
+
+def obter_sprite(caminho, escala):
+    """Sprite da peça na escala do preview, rasterizado só na primeira vez (ou quando o arquivo muda)."""
+    chave = (chave_versao(caminho), round(escala, 6))
+    with _lock:
+        if chave in _sprites:
+            _sprites.move_to_end(chave)
+            return _sprites[chave]
+
+    sprite = rasterizar_peca(caminho, escala)
+
+    with _lock:
+        _sprites[chave] = sprite
+        _sprites.move_to_end(chave)
+        while len(_sprites) > SPRITES_CACHE_MAX:
+            _sprites.popitem(last=False)
+    return sprite
+
+
+def limpar_cache_sprites():
+    with _lock:
+        _sprites.clear()
@@ -0,0 +1,64 @@
+import json
+import queue
+import threading
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from jobs import JobCancelado
+
+# Transmissão do progresso do pipeline em NDJSON (uma linha JSON por evento) ou Server-Sent Events
+FORMATOS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+_FIM = object()
+
+
+def _serializar(evento, formato):
+    dados = json.dumps(evento, ensure_ascii=False)
+    if formato == "sse":
+        return f"event: {evento.get('tipo', 'mensagem')}\ndata: {dados}\n\n"
+    return dados + "\n"
+
+
+def _eventos(funcao, entrada, formato):
+    fila = queue.Queue()
+    cancelado = threading.Event()
+
+    def progresso(evento):
+        if cancelado.is_set():
+            raise JobCancelado()
+        fila.put(evento)
+
+    def executar():
+        try:
+            resultado = funcao(entrada, progresso=progresso)
+            fila.put({"tipo": "resultado", **resultado})
+        except JobCancelado:
+            pass
+        except HTTPException as e:
+            fila.put({"tipo": "erro", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            fila.put({"tipo": "erro", "status_code": 500, "detail": str(e)})
+        finally:
+            fila.put(_FIM)
+
+    threading.Thread(target=executar, name="stream-planos", daemon=True).start()
+    try:
+        while True:
+            evento = fila.get()
+            if evento is _FIM:
+                return
+            yield _serializar(evento, formato)
+    finally:
+        # Cliente desconectou (ou terminou): o pipeline para no próximo ponto de progresso
+        cancelado.set()
+
+
+def transmitir(funcao, entrada, formato="ndjson"):
+    """Executa funcao(entrada, progresso=...) em segundo plano e devolve os eventos como resposta streaming."""
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: use {' ou '.join(FORMATOS)}.")
+    return StreamingResponse(
+        _eventos(funcao, entrada, formato),
+        media_type=FORMATOS[formato],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,27 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import perfilador
+
+
+@pytest.fixture
+def cliente():
+    # Sem o bloco "with": a API não executa a inicialização (espelho do Drive, arquivamento)
+    return TestClient(main.app)
+
+
+def test_rotas_desligadas_sem_token(cliente, monkeypatch):
+    monkeypatch.setattr(perfilador, "PERFIL_TOKEN", "")
+    assert cliente.get("/admin/perfis").status_code == 404
+    assert cliente.get("/admin/perfis/qualquer", headers={"X-Perfil-Token": ""}).status_code == 404
+
+
+def test_rotas_exigem_o_token(cliente, monkeypatch, tmp_path):
+    monkeypatch.setattr(perfilador, "PERFIL_TOKEN", "segredo")
+    monkeypatch.setattr(perfilador, "PERFIL_DIR", str(tmp_path))
+    assert cliente.get("/admin/perfis").status_code == 403
+    assert cliente.get("/admin/perfis", headers={"X-Perfil-Token": "errado"}).status_code == 403
+    resposta = cliente.get("/admin/perfis", headers={"X-Perfil-Token": "segredo"})
+    assert resposta.status_code == 200 and resposta.json() == {"perfis": []}
+    assert cliente.get("/admin/perfis/nao-existe", headers={"X-Perfil-Token": "segredo"}).status_code == 404
@@ -0,0 +1,44 @@
+import time
+import threading
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture(autouse=True)
+def agendados_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "AGENDADOS_DIR", str(tmp_path))
+    yield
+    jobs._parar_agendados.set()
+
+
+def test_so_um_dono_por_agendamento():
+    dono = jobs._assumir_agendamento("mover_antigos")
+    assert dono is not None
+    assert jobs._assumir_agendamento("mover_antigos") is None
+    assert jobs._assumir_agendamento("outro") is not None
+    dono.close()
+    # O dono saiu: o próximo assume
+    assert jobs._assumir_agendamento("mover_antigos") is not None
+
+
+def test_agendamento_exclusivo_roda_em_um_laco_so():
+    executados = []
+    lock = threading.Lock()
+
+    def registrar(origem, progresso=None):
+        with lock:
+            executados.append(origem)
+
+    laco_a = jobs.agendar_periodico("arquivar_teste", registrar, 0.02, "a", exclusivo=True)
+    laco_b = jobs.agendar_periodico("arquivar_teste", registrar, 0.02, "b", exclusivo=True)
+    prazo = time.monotonic() + 5
+    while len(executados) < 5 and time.monotonic() < prazo:
+        time.sleep(0.02)
+    jobs._parar_agendados.set()
+    laco_a.join(timeout=5)
+    laco_b.join(timeout=5)
+
+    assert len(executados) >= 5
+    assert len(set(executados)) == 1
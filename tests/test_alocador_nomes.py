@@ -0,0 +1,66 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import armazenamento
+import alocador_nomes
+from armazenamento import ArmazenamentoMemoria, PASTA_SAIDA
+from alocador_nomes import reservar_nomes, limpar_alocador
+
+
+@pytest.fixture
+def memoria(tmp_path, monkeypatch):
+    monkeypatch.setattr(alocador_nomes, "ALOCADOR_DIR", str(tmp_path / "alocador"))
+    anterior = armazenamento._armazenamento
+    mem = ArmazenamentoMemoria()
+    armazenamento.definir_armazenamento(mem)
+    limpar_alocador()
+    yield mem
+    limpar_alocador()
+    armazenamento.definir_armazenamento(anterior)
+
+
+def test_pula_os_nomes_ja_existentes(memoria):
+    memoria.adicionar(PASTA_SAIDA, "Plano E.dxf", b"x")
+    memoria.adicionar(PASTA_SAIDA, "Plano E_03.dxf", b"x")
+    memoria.adicionar(PASTA_SAIDA, "Plano EX.dxf", b"x")
+    assert reservar_nomes("Plano E.dxf", 3) == ["Plano E_02.dxf", "Plano E_04.dxf", "Plano E_05.dxf"]
+    assert reservar_nomes("Plano E.dxf", 1) == ["Plano E_06.dxf"]
+
+
+def test_threads_nunca_recebem_o_mesmo_nome(memoria):
+    with ThreadPoolExecutor(8) as executor:
+        nomes = [n for lote in executor.map(lambda _: reservar_nomes("G.dxf", 2), range(40)) for n in lote]
+    assert len(set(nomes)) == 80
+
+
+def test_consulta_lenta_nao_bloqueia_outros_nomes(memoria, monkeypatch):
+    liberar = threading.Event()
+    original = alocador_nomes.nomes_com_prefixo
+
+    def lenta(prefixo):
+        if prefixo == "Lento":
+            liberar.wait(5)
+        return original(prefixo)
+
+    monkeypatch.setattr(alocador_nomes, "nomes_com_prefixo", lenta)
+    with ThreadPoolExecutor(2) as executor:
+        lento = executor.submit(reservar_nomes, "Lento.dxf", 1)
+        rapido = executor.submit(reservar_nomes, "Rapido.dxf", 1)
+        try:
+            assert rapido.result(timeout=2) == ["Rapido.dxf"]
+        finally:
+            liberar.set()
+        assert lento.result(timeout=5) == ["Lento.dxf"]
+
+
+def test_arquivo_de_reservas_recriado_e_relido_do_inicio(memoria):
+    assert reservar_nomes("H.dxf", 3) == ["H.dxf", "H_02.dxf", "H_03.dxf"]
+    # Limpeza por TTL apaga o arquivo; outro processo volta a reservar a partir dele
+    caminho = alocador_nomes._caminho_reservas("H.dxf")
+    os.remove(caminho)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("H_04.dxf\n")
+    assert reservar_nomes("H.dxf", 1) == ["H_05.dxf"]
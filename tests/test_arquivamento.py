@@ -0,0 +1,48 @@
+import datetime
+
+import pytest
+
+import armazenamento
+from armazenamento import ArmazenamentoMemoria, PASTA_SAIDA, PASTA_ARQUIVO_MORTO, _data_do_plano, mover_arquivos_antigos
+
+
+@pytest.fixture
+def memoria():
+    anterior = armazenamento._armazenamento
+    mem = ArmazenamentoMemoria()
+    armazenamento.definir_armazenamento(mem)
+    yield mem
+    armazenamento.definir_armazenamento(anterior)
+
+
+@pytest.mark.parametrize("nome, data", [
+    ("Plano de corte Loja 01-01-2020.dxf", "01-01-2020"),
+    ("Plano de corte Loja 01-01-2020.png", "01-01-2020"),
+    ("Plano de corte Loja 01-01-2020_02.dxf", "01-01-2020"),
+    ("Plano de corte Loja 01-01-2020_03.png", "01-01-2020"),
+    ("Plano de corte Loja sem-data.dxf", None),
+    ("Outro arquivo 01-01-2020.dxf", None),
+])
+def test_data_do_plano(nome, data):
+    assert _data_do_plano(nome) == data
+
+
+def test_mover_antigos_agrupa_sufixos_pela_data_e_mantem_os_de_hoje(memoria):
+    hoje = datetime.datetime.now().strftime("%d-%m-%Y")
+    for nome in [
+        "Plano de corte A 01-01-2020.dxf",
+        "Plano de corte A 01-01-2020_02.dxf",
+        "Plano de corte A 01-01-2020_03.png",
+        f"Plano de corte B {hoje}.dxf",
+        f"Plano de corte B {hoje}_02.dxf",
+        f"Plano de corte B {hoje}_02.png",
+    ]:
+        memoria.adicionar(PASTA_SAIDA, nome, b"x")
+
+    resultado = mover_arquivos_antigos()
+
+    assert resultado == {'moved': 3, 'por_data': {"01-01-2020": 3}, 'falhas': 0}
+    assert sorted(m['name'] for m in memoria.listar(PASTA_SAIDA)) == [
+        f"Plano de corte B {hoje}.dxf", f"Plano de corte B {hoje}_02.dxf", f"Plano de corte B {hoje}_02.png",
+    ]
+    assert len(memoria.listar(PASTA_ARQUIVO_MORTO)) == 3
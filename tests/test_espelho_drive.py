@@ -0,0 +1,71 @@
+import pytest
+
+import google_drive
+from fake_drive import FakeDrive
+from espelho_drive import EspelhoDrive
+
+SAIDA, PLACAS, OUTRA = "pasta-saida", "pasta-placas", "pasta-fora"
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    fake = FakeDrive()
+    monkeypatch.setattr(google_drive, "drive_service", fake)
+    return fake
+
+
+@pytest.fixture
+def espelho(drive):
+    drive.adicionar("a.dxf", SAIDA, b"a", file_id="a")
+    drive.adicionar("b.dxf", SAIDA, b"b", file_id="b")
+    drive.adicionar("p.dxf", PLACAS, b"p", file_id="p")
+    espelho = EspelhoDrive([SAIDA, PLACAS])
+    espelho.carregar()
+    return espelho
+
+
+def nomes(espelho, pasta):
+    return {nome: meta['id'] for nome, meta in espelho.indice(pasta).items()}
+
+
+def test_carregar_lista_as_pastas(espelho):
+    assert nomes(espelho, SAIDA) == {"a.dxf": "a", "b.dxf": "b"}
+    assert nomes(espelho, PLACAS) == {"p.dxf": "p"}
+
+
+def test_criar_renomear_mover_e_excluir(drive, espelho):
+    nomes(espelho, SAIDA)  # índice em cache: precisa ser invalidado pelas mudanças
+    drive.adicionar("c.dxf", SAIDA, b"c", file_id="c")
+    drive.alterar("a", nome="a2.dxf")
+    drive.files().update(fileId="b", addParents=PLACAS, removeParents=SAIDA).execute()
+    drive.files().update(fileId="p", body={'trashed': True}).execute()
+
+    assert espelho.sincronizar() == 4
+    assert nomes(espelho, SAIDA) == {"a2.dxf": "a", "c.dxf": "c"}
+    assert nomes(espelho, PLACAS) == {"b.dxf": "b"}
+
+
+def test_excluir_e_mover_para_fora_das_pastas_espelhadas(drive, espelho):
+    drive.excluir("a")
+    drive.files().update(fileId="p", addParents=OUTRA, removeParents=PLACAS).execute()
+    drive.adicionar("fora.dxf", OUTRA, b"x")
+
+    assert espelho.sincronizar() == 2
+    assert nomes(espelho, SAIDA) == {"b.dxf": "b"}
+    assert nomes(espelho, PLACAS) == {}
+
+
+def test_conteudo_alterado_atualiza_os_metadados(drive, espelho):
+    drive.alterar("a", conteudo=b"novo")
+    espelho.sincronizar()
+    assert espelho.indice(SAIDA)["a.dxf"]["md5Checksum"] == drive.arquivos["a"]["md5Checksum"]
+
+
+def test_feed_paginado_e_token_avancado(drive, espelho):
+    for i in range(1500):  # mais de uma página de changes.list (pageSize=1000)
+        drive.alterar("a", nome=f"a-{i}.dxf")
+
+    espelho.sincronizar()
+    assert nomes(espelho, SAIDA) == {"a-1499.dxf": "a", "b.dxf": "b"}
+    assert espelho._token == str(len(drive.mudancas))
+    assert espelho.sincronizar() == 0
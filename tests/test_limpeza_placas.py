@@ -0,0 +1,93 @@
+import glob
+import os
+from functools import partial
+
+import pytest
+
+import armazenamento
+import cache_drive
+import detects_plaque
+from armazenamento import ArmazenamentoMemoria, PASTA_PLACAS, buscar, resolver_dxfs_personalizados
+from benchmarks.gerador_dxf import gerar_personalizado
+
+ID = "TESTELIMPEZA"
+
+
+@pytest.fixture
+def memoria(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_drive, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(detects_plaque, "_limpezas", type(detects_plaque._limpezas)())
+    anterior = armazenamento._armazenamento
+    mem = ArmazenamentoMemoria()
+    armazenamento.definir_armazenamento(mem)
+    yield mem
+    armazenamento.definir_armazenamento(anterior)
+    for caminho in glob.glob(f"/tmp/{ID}_limpo-*.dxf"):
+        os.remove(caminho)
+
+
+@pytest.fixture
+def contagem(monkeypatch):
+    """Quantas vezes o arquivo foi baixado e limpo de verdade."""
+    chamadas = {"downloads": 0, "limpezas": 0}
+    limpar = detects_plaque.limpar_dxf_placas
+
+    def limpar_contando(*args):
+        chamadas["limpezas"] += 1
+        return limpar(*args)
+
+    monkeypatch.setattr(detects_plaque, "limpar_dxf_placas", limpar_contando)
+    return chamadas
+
+
+def _personalizado(memoria, tmp_path, placas, file_id=None):
+    caminho = gerar_personalizado(str(tmp_path / "gerado.dxf"), placas=placas, entidades=5)
+    with open(caminho, "rb") as f:
+        return memoria.adicionar(PASTA_PLACAS, f"{ID} - Arquivo Personalizado.dxf", f.read(), file_id)
+
+
+def _limpar(contagem, cores):
+    arq = resolver_dxfs_personalizados([ID])[ID]
+
+    def baixar():
+        contagem["downloads"] += 1
+        return buscar(arq)
+
+    return detects_plaque.limpar_dxf_placas_cores(baixar, (arq['id'], arq['modifiedTime']), ID, cores)
+
+
+def test_segunda_chamada_usa_a_limpeza_memorizada(memoria, contagem, tmp_path):
+    _personalizado(memoria, tmp_path, placas=3)
+
+    qtd, nomes = _limpar(contagem, ["DOU", "ROS"])
+    assert qtd == 3 and set(nomes) == {"DOU", "ROS"}
+    assert contagem == {"downloads": 1, "limpezas": 1}
+
+    assert _limpar(contagem, ["ROS", "DOU"]) == (qtd, nomes)
+    assert contagem == {"downloads": 1, "limpezas": 1}
+
+    # Cor nova da mesma versão: copia a limpeza existente, sem baixar de novo
+    qtd, nomes = _limpar(contagem, ["PRA"])
+    assert qtd == 3 and os.path.exists(f"/tmp/{nomes['PRA']}")
+    assert contagem == {"downloads": 1, "limpezas": 1}
+
+
+def test_modified_time_novo_limpa_de_novo(memoria, contagem, tmp_path):
+    file_id = _personalizado(memoria, tmp_path, placas=3)
+    assert _limpar(contagem, ["DOU"])[0] == 3
+
+    # Mesmo arquivo do Drive regravado com outro conteúdo e outro modifiedTime
+    _personalizado(memoria, tmp_path, placas=2, file_id=file_id)
+    meta, conteudo = memoria.pastas[PASTA_PLACAS][file_id]
+    meta['modifiedTime'] = "2099-01-01T00:00:00.000000Z"
+
+    qtd, nomes = _limpar(contagem, ["DOU"])
+    assert qtd == 2 and os.path.exists(f"/tmp/{nomes['DOU']}")
+    assert contagem == {"downloads": 2, "limpezas": 2}
+
+
+def test_memoriza_arquivo_sem_placas(memoria, contagem, tmp_path):
+    _personalizado(memoria, tmp_path, placas=0)
+    assert _limpar(contagem, ["DOU"]) == (0, {})
+    assert _limpar(contagem, ["DOU"]) == (0, {})
+    assert contagem == {"downloads": 1, "limpezas": 1}
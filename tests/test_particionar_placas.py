@@ -0,0 +1,72 @@
+import random
+
+import ezdxf
+import pytest
+from ezdxf import bbox
+
+from detects_plaque import CELULA_GRADE, particionar_por_placa
+
+
+def _particao_forca_bruta(entidades, caixas):
+    """Atribuição antiga: cada entidade testada contra todas as placas."""
+    por_placa = [[] for _ in caixas]
+    for i, (x1, y1, x2, y2) in enumerate(caixas):
+        for entity in entidades:
+            bb = bbox.extents([entity])
+            if not bb.has_data or (bb.extmin.x >= x1 and bb.extmax.x <= x2 and bb.extmin.y >= y1 and bb.extmax.y <= y2):
+                por_placa[i].append(entity)
+    return por_placa
+
+
+# Placas menores e maiores que uma célula, cruzando as bordas das células, em coordenadas negativas
+# e encostadas umas nas outras (mesma borda)
+C = CELULA_GRADE
+CAIXAS = [
+    (10, 10, 60, 40),                        # pequena, dentro de uma célula
+    (C - 30, 20, C + 40, 90),                # pequena, cruzando a borda x = C
+    (C * 2 + 5, C - 20, C * 2 + 80, C + 20), # pequena, cruzando a borda y = C
+    (C * 4, 0, C * 6.5, C * 2.5),            # grande, várias células
+    (C * 6.5, 0, C * 7, C * 2.5),            # encostada na grande (borda comum)
+    (-C * 1.5, -C * 1.2, -C * 0.1, -10),     # coordenadas negativas
+    (C * 3 - 1, C * 3 - 1, C * 3 + 1, C * 3 + 1),  # minúscula, em cima de um canto de célula
+]
+
+
+def _gerar_entidades(msp, semente):
+    aleatorio = random.Random(semente)
+    for x1, y1, x2, y2 in CAIXAS:
+        for _ in range(15):
+            # Dentro da caixa
+            ax, bx = sorted(aleatorio.uniform(x1, x2) for _ in range(2))
+            ay, by = sorted(aleatorio.uniform(y1, y2) for _ in range(2))
+            msp.add_line((ax, ay), (bx, by))
+            raio = min(bx - ax, by - ay, 1) / 2
+            msp.add_circle(((ax + bx) / 2, (ay + by) / 2), raio)
+            # Saindo da caixa por um dos lados
+            msp.add_line((ax, ay), (x2 + aleatorio.uniform(0.1, 50), by))
+            msp.add_line((x1 - aleatorio.uniform(0.1, 50), ay), (bx, by))
+        # Exatamente sobre a borda da caixa
+        msp.add_lwpolyline([(x1, y1), (x2, y1), (x2, y2), (x1, y2)], close=True)
+    # Espalhadas por toda a área, inclusive atravessando várias células
+    for _ in range(200):
+        x, y = aleatorio.uniform(-C * 2, C * 8), aleatorio.uniform(-C * 2, C * 4)
+        msp.add_line((x, y), (x + aleatorio.uniform(0, C * 1.5), y + aleatorio.uniform(0, C * 1.5)))
+    # Sem extensão: entra em todas as placas
+    msp.add_text("")
+
+
+@pytest.mark.parametrize("semente", [1, 2, 3])
+def test_particao_igual_a_forca_bruta(semente):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    _gerar_entidades(msp, semente)
+    entidades = list(msp)
+
+    por_placa, fora = particionar_por_placa(entidades, CAIXAS)
+
+    esperado = _particao_forca_bruta(entidades, CAIXAS)
+    assert [[id(e) for e in lista] for lista in por_placa] == [[id(e) for e in lista] for lista in esperado]
+    em_alguma = {id(e) for lista in esperado for e in lista}
+    assert [id(e) for e in fora] == [id(e) for e in entidades if id(e) not in em_alguma]
+    # O teste só vale se as placas receberam entidades e sobrou algo fora delas
+    assert all(len(lista) > 1 for lista in por_placa) and fora